@@ -0,0 +1,69 @@
+import importlib
+import sys
+
+# 서브커맨드 -> (모듈, 함수, 설명). 모듈은 고른 명령에서만 import 한다
+COMMANDS = {
+    "sync": ("main", "main", "위키에서 스프라이트 다운로드 (images/)"),
+    "check": ("check", "main", "캐릭터 갤러리의 Sprites 섹션 구성 확인"),
+    "crop": ("crop_ops", "main", "저장된 crop 위치로 일괄 crop (emotion/)"),
+    "chatimg": ("chat_compose", "main", "채팅 이미지 일괄 생성 (chatimg/)"),
+    "merge": ("overlay_batch", "main", "베이스/오버레이 PNG 일괄 합성"),
+    "pipeline": ("pipeline", "main", "다운로드 -> crop -> 채팅 이미지 스트리밍 처리"),
+    "hash": ("sprite_hash", "main", "중복/유사 스프라이트 찾기"),
+    "meta": ("sprite_meta", "main", "스프라이트 메타데이터 인덱스 만들기"),
+    "layers": ("sprite_layers", "main", "공통 베이스 + 표정 패치로 저장"),
+    "pack": ("sprite_pack", "main", "출력 폴더를 팩 파일 하나로 묶기 / 풀기"),
+    "bench": ("bench", "main", "오프라인 벤치마크 실행 / 기준 결과와 비교"),
+    "resample": ("resample", "main", "리샘플링 티어별 속도/화질 비교"),
+    "view": ("image_viewer", "main", "감정 이미지 뷰어 (PyQt6)"),
+    "keymap": ("small_key_mapper", "main", "키 매퍼 (Tkinter)"),
+}
+
+# --gui를 주면 같은 작업의 창 버전을 띄운다
+GUI_COMMANDS = {
+    "crop": "face_cropper",
+    "chatimg": "chatimg",
+    "merge": "merge_image",
+}
+
+# 인자를 받지 않는 창 프로그램
+NO_ARGV = {"keymap"}
+
+
+def usage() -> str:
+    lines = ["usage: ba-sprites <command> [args...]", "", "commands:"]
+    for name, (_, _, help_text) in COMMANDS.items():
+        gui = " (--gui: 창 모드)" if name in GUI_COMMANDS else ""
+        lines.append(f"  {name:<10}{help_text}{gui}")
+    lines.append("")
+    lines.append("각 명령의 옵션은 ba-sprites <command> --help")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return
+
+    cmd, rest = argv[0], argv[1:]
+    if cmd not in COMMANDS:
+        print(usage(), file=sys.stderr)
+        raise SystemExit(f"\nunknown command: {cmd}")
+
+    if "--gui" in rest and cmd in GUI_COMMANDS:
+        importlib.import_module(GUI_COMMANDS[cmd]).main()
+        return
+
+    module_name, func_name, _ = COMMANDS[cmd]
+    # 각 모듈의 argparse 사용법에 "ba-sprites <command>"가 나오게 한다
+    sys.argv[0] = f"ba-sprites {cmd}"
+    func = getattr(importlib.import_module(module_name), func_name)
+    if cmd in NO_ARGV:
+        func()
+    else:
+        func(rest)
+
+
+if __name__ == "__main__":
+    main()
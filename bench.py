@@ -0,0 +1,345 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFilter
+
+BENCH_DIR = Path("./.bench")
+BENCH_RESULTS = Path("./bench_results.json")
+# 저장소에 커밋된 기준 결과 (기준을 바꾸려면 --out bench_baseline.json으로 다시 기록)
+BENCH_BASELINE = Path("./bench_baseline.json")
+BENCH_THRESHOLD = 0.15
+BENCH_REPEAT = 5
+
+SPRITE_SIZE = (1200, 1600)
+FACE_SIZE = (512, 512)
+
+
+class BenchCase:
+    def __init__(self, name: str, items: int, run, reset=None, out_bytes: int | None = None):
+        self.name = name
+        self.items = items
+        self.run = run
+        self.reset = reset
+        self.out_bytes = out_bytes
+
+
+def make_sprite(size: tuple[int, int], seed: int) -> Image.Image:
+    # 투명 배경 위에 노이즈 질감이 있는 몸통/머리 모양 -> 실제 스프라이트와 비슷한 PNG 크기
+    rnd = random.Random(seed)
+    w, h = size
+    bands = [Image.effect_noise(size, 24 + rnd.randint(0, 16)).point(lambda v, o=rnd.randint(40, 200): (v + o) % 256)
+             for _ in range(3)]
+    img = Image.merge("RGB", bands).filter(ImageFilter.GaussianBlur(1.2)).convert("RGBA")
+
+    mask = Image.new("L", size, 0)
+    draw = ImageDraw.Draw(mask)
+    cx = w // 2 + rnd.randint(-w // 20, w // 20)
+    head = w // 5
+    draw.ellipse((cx - head, h // 12, cx + head, h // 12 + head * 2), fill=255)
+    draw.rounded_rectangle((cx - w // 4, h // 12 + head * 2 - 20, cx + w // 4, h - 1), radius=w // 10, fill=255)
+    for _ in range(6):
+        x, y = rnd.randint(0, w), rnd.randint(h // 4, h)
+        r = rnd.randint(w // 20, w // 8)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=255)
+    img.putalpha(mask.filter(ImageFilter.GaussianBlur(2)))
+    return img
+
+
+def sprite_fixtures(root: Path, count: int, size: tuple[int, int] = SPRITE_SIZE) -> list[Path]:
+    folder = root / f"sprites_{size[0]}x{size[1]}"
+    folder.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(count):
+        p = folder / f"Bench_{i:03d}.png"
+        if not p.exists():
+            make_sprite(size, seed=i).save(p)
+        paths.append(p)
+    return paths
+
+
+def gallery_html(files: int, seed: int = 0) -> str:
+    # MediaWiki 갤러리 섹션과 비슷한 구조 (같은 파일 링크가 썸네일/캡션으로 두 번씩 나옴)
+    rnd = random.Random(seed)
+    parts = ['<div class="mw-parser-output"><h3><span class="mw-headline">Sprites</span></h3><ul class="gallery">']
+    for i in range(files):
+        name = f"Bench_{rnd.choice(['Default', 'Swimsuit', 'Bunny'])}_{i:04d}.png"
+        parts.append(
+            f'<li class="gallerybox" style="width: 155px"><div class="thumb" style="width: 150px;">'
+            f'<a href="/wiki/File:{name}" class="image"><img alt="" src="/images/thumb/{i % 16:x}/{name}/120px-{name}" '
+            f'decoding="async" width="90" height="120" /></a></div>'
+            f'<div class="gallerytext"><p><a href="/wiki/File:{name}" title="File:{name}">{name}</a></p></div></li>'
+        )
+        if i % 7 == 0:
+            parts.append(f'<li><a href="/wiki/Category:Bench_{i}">category</a><span>{"x" * 40}</span></li>')
+    parts.append("</ul></div>")
+    return "".join(parts)
+
+
+def file_titles(count: int, seed: int = 0) -> list[tuple[str, str]]:
+    rnd = random.Random(seed)
+    pieces = ["Rin", "Kayoko (New Year)", "Arisu: Maid", "Hoshino <Armed>", "Shiroko*Terror", "미카", "Hina/Dress"]
+    out = []
+    for i in range(count):
+        name = f"{rnd.choice(pieces)}  {i:05d} %28test%29?.png"
+        url = f"https://static.wikitide.net/bluearchivewiki/{i % 16:x}/{i % 256:02x}/{name.replace(' ', '_')}"
+        out.append((f"File:{name}", url))
+    return out
+
+
+def case_html(fixtures: Path, quick: bool) -> BenchCase:
+    from main import extract_file_titles_from_html
+
+    files = 300 if quick else 2000
+    html = gallery_html(files)
+    return BenchCase("html.extract_file_titles", files, lambda: extract_file_titles_from_html(html))
+
+
+def case_names(fixtures: Path, quick: bool) -> BenchCase:
+    from main import filename_from_filetitle_or_url
+
+    titles = file_titles(10000 if quick else 100000)
+
+    def run():
+        for title, url in titles:
+            filename_from_filetitle_or_url(title, url)
+
+    return BenchCase("names.filename_from_filetitle", len(titles), run)
+
+
+def case_crop(fixtures: Path, quick: bool) -> BenchCase:
+    from crop_ops import render_crop
+
+    paths = sprite_fixtures(fixtures, 3 if quick else 8)
+
+    def run():
+        for p in paths:
+            render_crop(p, [0, 128, 64], 400, 150, 400)
+
+    return BenchCase("crop.render_crop", len(paths), run)
+
+
+def case_resample(fixtures: Path, quick: bool) -> BenchCase:
+    from crop_ops import open_rgba
+    from resample import TIER_FINAL, resize_image
+
+    images = [open_rgba(p) for p in sprite_fixtures(fixtures, 3 if quick else 8)]
+
+    def run():
+        for img in images:
+            resize_image(img, (200, 267), TIER_FINAL)
+
+    return BenchCase("resample.final_200", len(images), run)
+
+
+def case_encode(fixtures: Path, quick: bool) -> list[BenchCase]:
+    from crop_ops import open_rgba
+    from output_store import OUTPUT_FORMATS, check_format, encode_image
+
+    # crop 결과와 비슷한 크기의 얼굴 이미지를 형식별로 인코딩 (시간 + 결과 크기)
+    faces = [open_rgba(p) for p in sprite_fixtures(fixtures, 4 if quick else 16, FACE_SIZE)]
+    cases = []
+    for fmt in OUTPUT_FORMATS:
+        try:
+            check_format(fmt)
+        except ValueError:
+            continue
+        out_bytes = sum(len(encode_image(img, fmt)) for img in faces)
+        cases.append(BenchCase(
+            f"encode.{fmt}", len(faces), lambda fmt=fmt: [encode_image(img, fmt) for img in faces], out_bytes=out_bytes
+        ))
+    return cases
+
+
+def case_chat(fixtures: Path, quick: bool) -> BenchCase:
+    from chat_compose import render_chat_file
+
+    paths = sprite_fixtures(fixtures, 4 if quick else 16, FACE_SIZE)
+
+    def run():
+        for p in paths:
+            render_chat_file(p)
+
+    return BenchCase("chat.render_chat_file", len(paths), run)
+
+
+def case_output_store(fixtures: Path, quick: bool) -> BenchCase:
+    from output_store import POLICY_VERSION, OutputStore
+
+    # 이미 여러 버전이 쌓인 폴더에 새 버전을 쓰는 경우 (예전 next_available_path 자리)
+    folder = fixtures / "crowded"
+    names = 200 if quick else 1000
+    versions = 3
+    # 잠금 파일(.ba_sprites.lock)은 세지 않는다
+    if not folder.is_dir() or sum(n.endswith(".png") for n in os.listdir(folder)) != names * versions:
+        shutil.rmtree(folder, ignore_errors=True)
+        folder.mkdir(parents=True)
+        for i in range(names):
+            for v in range(versions):
+                suffix = f"_{v}" if v else ""
+                (folder / f"face_{i:04d}{suffix}.png").write_bytes(f"{i}-{v}".encode())
+    writes = [(f"face_{i:04d}.png", f"new-{i}".encode()) for i in range(0, names, 2)]
+
+    def run():
+        store = OutputStore(POLICY_VERSION)
+        for name, data in writes:
+            store.write(folder, name, data)
+
+    def reset():
+        for name, _ in writes:
+            stem = Path(name).stem
+            (folder / f"{stem}_{versions}.png").unlink(missing_ok=True)
+
+    return BenchCase("store.version_write", len(writes), run, reset)
+
+
+def case_thumbs(fixtures: Path, quick: bool) -> BenchCase | None:
+    try:
+        from PyQt6.QtCore import Qt
+        from PyQt6.QtGui import QImageReader
+        from image_viewer import thumb_bucket
+    except ImportError:
+        return None
+
+    paths = sprite_fixtures(fixtures, 3 if quick else 8)
+
+    def run():
+        # ThumbnailJob과 같은 경로: 원본 크기만 읽고 버킷 크기로 축소 디코딩
+        for p in paths:
+            reader = QImageReader(str(p))
+            src = reader.size()
+            target = src.scaled(370, 185, Qt.AspectRatioMode.KeepAspectRatio)
+            bucket = thumb_bucket(target.width(), target.height())
+            reader.setScaledSize(src.scaled(bucket, bucket, Qt.AspectRatioMode.KeepAspectRatio))
+            reader.read()
+
+    return BenchCase("viewer.thumbnail_decode", len(paths), run)
+
+
+CASES = {
+    "html": case_html,
+    "names": case_names,
+    "crop": case_crop,
+    "resample": case_resample,
+    "encode": case_encode,
+    "chat": case_chat,
+    "store": case_output_store,
+    "thumbs": case_thumbs,
+}
+
+
+def measure(case: BenchCase, repeat: int) -> dict:
+    case.run()  # 워밍업 (import, 파일 캐시)
+    if case.reset:
+        case.reset()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        case.run()
+        times.append(time.perf_counter() - t0)
+        if case.reset:
+            case.reset()
+    median = statistics.median(times)
+    result = {
+        "items": case.items,
+        "repeat": repeat,
+        "median_s": median,
+        "min_s": min(times),
+        "items_per_s": case.items / median if median > 0 else 0.0,
+    }
+    if case.out_bytes is not None:
+        result["bytes_per_item"] = case.out_bytes / case.items
+    return result
+
+
+def environment() -> dict:
+    import PIL
+
+    return {
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    # 짧은 항목은 중앙값이 흔들려서 최솟값끼리 비교한다
+    regressions = []
+    print(f"[BENCH] compare min time (threshold +{threshold * 100:.0f}%)")
+    for name, cur in results["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        if base is None:
+            print(f"[BENCH]   {name:<30} (no baseline)")
+            continue
+        ratio = cur["min_s"] / base["min_s"] if base["min_s"] > 0 else 1.0
+        mark = ""
+        if ratio > 1 + threshold:
+            mark = "  <-- REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            mark = "  (faster)"
+        print(f"[BENCH]   {name:<30} {base['min_s'] * 1000:9.1f}ms -> {cur['min_s'] * 1000:9.1f}ms  x{ratio:.2f}{mark}")
+    return regressions
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="오프라인 벤치마크 (합성 스프라이트/HTML 사용)")
+    ap.add_argument("cases", nargs="*", help=f"실행할 항목 (기본: 전체 {', '.join(CASES)})")
+    ap.add_argument("--quick", action="store_true", help="작은 입력으로 빠르게")
+    ap.add_argument("--repeat", type=int, default=BENCH_REPEAT)
+    ap.add_argument("--fixtures", type=Path, default=BENCH_DIR, help="생성한 테스트 이미지를 둘 폴더")
+    ap.add_argument("--out", type=Path, default=BENCH_RESULTS)
+    ap.add_argument("--baseline", type=Path, default=BENCH_BASELINE, help=f"비교할 기준 결과 JSON (기본: {BENCH_BASELINE})")
+    ap.add_argument("--no-baseline", dest="baseline", action="store_const", const=None, help="기준 결과와 비교하지 않음")
+    ap.add_argument("--threshold", type=float, default=BENCH_THRESHOLD, help="이 비율 이상 느려지면 회귀로 표시")
+    return ap
+
+
+def main(argv: list[str] | None = None):
+    ap = build_arg_parser()
+    args = ap.parse_args(argv)
+    unknown = [c for c in args.cases if c not in CASES]
+    if unknown:
+        ap.error(f"unknown case: {', '.join(unknown)} (choose from {', '.join(CASES)})")
+    args.fixtures.mkdir(parents=True, exist_ok=True)
+
+    results = {"env": environment(), "quick": args.quick, "cases": {}}
+    for key in args.cases or list(CASES):
+        cases = CASES[key](args.fixtures, args.quick)
+        if not cases:
+            print(f"[BENCH] {key}: skipped (dependency not available)")
+            continue
+        for case in cases if isinstance(cases, list) else [cases]:
+            r = measure(case, args.repeat)
+            results["cases"][case.name] = r
+            line = f"[BENCH] {case.name:<30} {r['median_s'] * 1000:9.1f}ms  {r['items_per_s']:10.1f} items/s  (n={r['items']})"
+            if "bytes_per_item" in r:
+                line += f"  {r['bytes_per_item'] / 1024:.1f}KB/item"
+            print(line)
+
+    args.out.write_text(json.dumps(results, ensure_ascii=False, indent=1), encoding="utf-8")
+    print(f"[BENCH] results -> {args.out}")
+
+    if args.baseline and args.out.resolve() == args.baseline.resolve():
+        print(f"[BENCH] baseline updated -> {args.baseline}")
+    elif args.baseline and not args.baseline.is_file():
+        print(f"[BENCH] warning: baseline not found: {args.baseline} (comparison skipped)")
+    elif args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        if baseline.get("quick") != args.quick:
+            print("[BENCH] warning: baseline was recorded with a different --quick setting")
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
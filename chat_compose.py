@@ -0,0 +1,246 @@
+import argparse
+import os
+from pathlib import Path
+
+from PIL import Image
+
+from crop_ops import open_rgba, scan_png
+from mem_budget import MemoryBudget, add_memory_args, image_cost, report_peak_rss, submit_bounded
+from output_store import (
+    FORMAT_PNG,
+    OUTPUT_EXTS,
+    OUTPUT_FORMATS,
+    OUTPUT_POLICIES,
+    POLICY_SKIP,
+    STATUS_SAVED,
+    OutputStore,
+    add_format_arg,
+    encode_image,
+    prefer_by_stem,
+)
+from profiling import add_profile_args, check_profile_workers, phase, process_pool, profile_run
+from resample import TIER_FINAL, add_resample_arg, resize_image
+from sprite_hash import HashIndex
+
+PNG_EXT = ".png"
+
+CHAT_IMG_SIZE = (200, 200)
+CHAT_OUT_SIZE = (800, 200)
+CHAT_MARGIN = 50
+CHAT_SIDES = ("left", "right")
+
+_CANVASES: dict[tuple[int, int], "ChatCanvas"] = {}
+
+
+def side_offset(side: str, img_w: int, out_w: int, margin: int) -> int:
+    if side == "left":
+        return margin
+    return max(0, out_w - img_w - margin)
+
+
+def chat_variant_name(stem: str, side: str, suffix: str = PNG_EXT) -> str:
+    return f"{stem}_{side}{suffix}"
+
+
+def prepare_face(img: Image.Image, img_size: tuple[int, int], tier: str = TIER_FINAL) -> Image.Image:
+    if img.mode != "RGBA":
+        img = img.convert("RGBA")
+    return resize_image(img, img_size, tier)
+
+
+class ChatCanvas:
+    def __init__(self, out_size: tuple[int, int]):
+        self.out_size = out_size
+        self.canvas = Image.new("RGBA", out_size, (0, 0, 0, 0))
+        self.dirty: tuple[int, int, int, int] | None = None
+
+    def place(self, face: Image.Image, x: int) -> Image.Image:
+        # 매번 새 캔버스를 만들지 않고 직전에 붙인 영역만 투명하게 되돌린다
+        if self.dirty is not None:
+            self.canvas.paste((0, 0, 0, 0), self.dirty)
+        self.canvas.paste(face, (x, 0))
+        w, h = self.out_size
+        self.dirty = (min(x, w), 0, min(w, x + face.width), min(h, face.height))
+        return self.canvas
+
+
+def chat_canvas(out_size: tuple[int, int]) -> ChatCanvas:
+    canvas = _CANVASES.get(out_size)
+    if canvas is None:
+        canvas = ChatCanvas(out_size)
+        _CANVASES[out_size] = canvas
+    return canvas
+
+
+def compose_chat_image(
+    face: Image.Image, side: str, out_size: tuple[int, int], margin: int = CHAT_MARGIN
+) -> Image.Image:
+    x = side_offset(side, face.width, out_size[0], margin)
+    return chat_canvas(out_size).place(face, x).copy()
+
+
+def render_chat_file(
+    img_path: Path,
+    img_size: tuple[int, int] = CHAT_IMG_SIZE,
+    out_size: tuple[int, int] = CHAT_OUT_SIZE,
+    margin: int = CHAT_MARGIN,
+    tier: str = TIER_FINAL,
+    fmt: str = FORMAT_PNG,
+) -> dict[str, bytes]:
+    ext = OUTPUT_FORMATS[fmt][0]
+    with open_rgba(img_path) as img, phase("resize"):
+        face = prepare_face(img, img_size, tier)
+        if face is img:
+            face = img.copy()
+    canvas = chat_canvas(out_size)
+    out = {}
+    for side in CHAT_SIDES:
+        x = side_offset(side, face.width, out_size[0], margin)
+        with phase("compose"):
+            chat_img = canvas.place(face, x)
+        out[chat_variant_name(img_path.stem, side, ext)] = encode_image(chat_img, fmt)
+    return out
+
+
+def generate_all(
+    emotion_root: Path,
+    out_root: Path,
+    chars: list[str] | None = None,
+    img_size: tuple[int, int] = CHAT_IMG_SIZE,
+    out_size: tuple[int, int] = CHAT_OUT_SIZE,
+    margin: int = CHAT_MARGIN,
+    policy: str = POLICY_SKIP,
+    max_workers: int | None = None,
+    duplicates: dict[Path, Path] | None = None,
+    budget: MemoryBudget | None = None,
+    tier: str = TIER_FINAL,
+    fmt: str = FORMAT_PNG,
+) -> dict[str, tuple[int, int, int]]:
+    # 프로세스 풀과 tqdm은 실제로 작업할 때만 불러서 CLI 시작을 가볍게 한다
+    from tqdm import tqdm
+
+    if chars is None:
+        chars = sorted(p.name for p in emotion_root.iterdir() if p.is_dir())
+
+    jobs: list[tuple[str, Path]] = []
+    for char in chars:
+        # crop 단계가 WebP로 저장했어도 그대로 읽는다. 같은 이름이 둘이면 같은 _left/_right를 쓰므로 하나만
+        for img_path in prefer_by_stem(scan_png(emotion_root / char, OUTPUT_EXTS)):
+            jobs.append((char, img_path))
+
+    store = OutputStore(policy)
+    ext = OUTPUT_FORMATS[fmt][0]
+    remaining = {char: 0 for char in chars}
+    for char, _ in jobs:
+        remaining[char] += 1
+    results = {char: (0, 0, 0) for char in chars}
+
+    # 내용이 같은 얼굴은 한 번만 렌더링하고 각 파일 이름으로 나눠 쓴다
+    groups: dict[Path, list[tuple[str, Path]]] = {}
+    for char, img_path in jobs:
+        groups.setdefault((duplicates or {}).get(img_path, img_path), []).append((char, img_path))
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    budget = budget or MemoryBudget()
+    with process_pool(max_workers) as ex, tqdm(total=len(jobs), desc="ChatImg") as bar:
+        tasks = (
+            (members, image_cost(members[0][1]), render_chat_file, (members[0][1], img_size, out_size, margin, tier, fmt))
+            for members in groups.values()
+        )
+        for members, fut in submit_bounded(ex, tasks, budget):
+            src = members[0][1]
+            try:
+                rendered = fut.result()
+                error = None
+            except Exception as e:
+                rendered, error = None, e
+
+            for char, img_path in members:
+                ok, skipped, fail = results[char]
+                try:
+                    if rendered is None:
+                        raise error
+                    for side in CHAT_SIDES:
+                        data = rendered[chat_variant_name(src.stem, side, ext)]
+                        name = chat_variant_name(img_path.stem, side, ext)
+                        _, status = store.write(out_root / char, name, data)
+                        if status == STATUS_SAVED:
+                            ok += 1
+                        else:
+                            skipped += 1
+                except Exception as e:
+                    bar.write(f"[CHAT] {char}/{img_path.name} FAILED: {e}")
+                    fail += 1
+                results[char] = (ok, skipped, fail)
+                bar.update(1)
+
+                remaining[char] -= 1
+                if remaining[char] == 0:
+                    bar.write(f"[CHAT] {char}: saved={ok} skipped={skipped} failed={fail}")
+
+    print(f"[CHAT] {fmt}: {store.summary()}")
+    return results
+
+
+def _parse_size(raw: str) -> tuple[int, int]:
+    w, _, h = raw.lower().partition("x")
+    size = (int(w), int(h or w))
+    if size[0] <= 0 or size[1] <= 0:
+        raise argparse.ArgumentTypeError(f"invalid size: {raw}")
+    return size
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="emotion/ 아래 모든 캐릭터의 채팅 이미지를 병렬로 생성")
+    ap.add_argument("chars", nargs="*", help="캐릭터 이름 (생략하면 전체)")
+    ap.add_argument("--emotion-root", type=Path, default=Path("./emotion"))
+    ap.add_argument("--out-root", type=Path, default=Path("./chatimg"))
+    ap.add_argument("--img-size", type=_parse_size, default=CHAT_IMG_SIZE, help="WxH (기본 200x200)")
+    ap.add_argument("--out-size", type=_parse_size, default=CHAT_OUT_SIZE, help="WxH (기본 800x200)")
+    ap.add_argument("--margin", type=int, default=CHAT_MARGIN)
+    ap.add_argument("--policy", choices=OUTPUT_POLICIES, default=POLICY_SKIP)
+    ap.add_argument("--workers", type=int, default=None, help="0이면 현재 프로세스에서 실행")
+    ap.add_argument("--dedupe", action="store_true", help="해시 인덱스로 같은 얼굴은 한 번만 렌더링")
+    add_format_arg(ap)
+    add_resample_arg(ap)
+    add_memory_args(ap)
+    add_profile_args(ap, "profile_chatimg.prof")
+    return ap
+
+
+def main(argv: list[str] | None = None):
+    ap = build_arg_parser()
+    args = ap.parse_args(argv)
+    check_profile_workers(ap, args)
+    if not args.emotion_root.is_dir():
+        raise SystemExit(f"emotion 폴더를 찾지 못했습니다: {args.emotion_root.resolve()}")
+
+    budget = MemoryBudget(args.memory_mb)
+    with profile_run(args.profile, args.profile_top, name="chatimg"):
+        duplicates = None
+        if args.dedupe:
+            with phase("dedupe"):
+                index = HashIndex(args.emotion_root)
+                index.refresh(args.workers)
+                duplicates = index.canonical_map()
+            print(f"[CHAT] dedupe: {len(duplicates)} duplicate faces reuse another render")
+        generate_all(
+            args.emotion_root,
+            args.out_root,
+            chars=args.chars or None,
+            img_size=args.img_size,
+            out_size=args.out_size,
+            margin=args.margin,
+            policy=args.policy,
+            max_workers=args.workers,
+            duplicates=duplicates,
+            budget=budget,
+            tier=args.resample,
+            fmt=args.format,
+        )
+    report_peak_rss("CHAT", budget)
+
+
+if __name__ == "__main__":
+    main()
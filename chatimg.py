@@ -1,25 +1,27 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from pathlib import Path
-from PIL import Image, ImageTk
+from PIL import ImageTk
+
+from chat_compose import CHAT_MARGIN, CHAT_SIDES, chat_canvas, chat_variant_name, prepare_face, side_offset
+from crop_ops import open_rgba
+from fs_watch import WATCH_INTERVAL_MS, Changes, TreeIndex
+from output_store import (
+    FORMAT_PNG,
+    OUTPUT_EXTS,
+    OUTPUT_FORMATS,
+    OUTPUT_POLICIES,
+    POLICY_SKIP,
+    STATUS_SAVED,
+    OutputStore,
+    encode_image,
+    prefer_by_stem,
+)
+from resample import TIER_PREVIEW, resize_image
 
 PNG_EXT = ".png"
 
 
-def next_available_path(dst_dir: Path, filename: str) -> Path:
-    base = Path(filename).stem
-    ext = Path(filename).suffix
-    candidate = dst_dir / filename
-    if not candidate.exists():
-        return candidate
-    i = 1
-    while True:
-        cand = dst_dir / f"{base}_{i}{ext}"
-        if not cand.exists():
-            return cand
-        i += 1
-
-
 class ChatImageBuilder:
     def __init__(self, root: tk.Tk):
         self.root = root
@@ -34,8 +36,11 @@ class ChatImageBuilder:
         self.preview_path: Path | None = None
         self.preview_imgtk: ImageTk.PhotoImage | None = None
 
+        self.emotion_index = TreeIndex(self.emotion_root, depth=1, suffixes=OUTPUT_EXTS)
+
         self._build_ui()
-        self.refresh_character_list()
+        self._show_character_list()
+        self.root.after(WATCH_INTERVAL_MS, self._poll_fs)
 
     def _build_ui(self):
         top = tk.Frame(self.root)
@@ -81,6 +86,18 @@ class ChatImageBuilder:
         tk.Label(size_row, text="x").pack(side="left")
         tk.Entry(size_row, textvariable=self.out_h_var, width=6).pack(side="left", padx=(2, 10))
 
+        tk.Label(size_row, text="저장 방식:").pack(side="left")
+        self.policy_var = tk.StringVar(value=POLICY_SKIP)
+        ttk.Combobox(
+            size_row, textvariable=self.policy_var, values=OUTPUT_POLICIES, state="readonly", width=10
+        ).pack(side="left", padx=(6, 10))
+
+        tk.Label(size_row, text="형식:").pack(side="left")
+        self.format_var = tk.StringVar(value=FORMAT_PNG)
+        ttk.Combobox(
+            size_row, textvariable=self.format_var, values=list(OUTPUT_FORMATS), state="readonly", width=9
+        ).pack(side="left", padx=(6, 10))
+
         tk.Button(size_row, text="Generate All", command=self.generate_all).pack(side="right")
 
         self.status = tk.Label(right, text="emotion 폴더를 읽습니다.", anchor="w")
@@ -90,7 +107,11 @@ class ChatImageBuilder:
         self.canvas.pack(fill="both", expand=True, pady=(6, 0))
 
     def refresh_character_list(self):
-        if not self.emotion_root.exists() or not self.emotion_root.is_dir():
+        self.emotion_index = TreeIndex(self.emotion_root, depth=1, suffixes=OUTPUT_EXTS)
+        self._show_character_list()
+
+    def _show_character_list(self):
+        if self.emotion_root not in self.emotion_index.dirs:
             self.char_combo["values"] = []
             self.char_var.set("")
             self.listbox.delete(0, "end")
@@ -98,7 +119,7 @@ class ChatImageBuilder:
             self.status.config(text=f"./emotion 폴더를 찾지 못했습니다: {self.emotion_root.resolve()}")
             return
 
-        chars = sorted([p.name for p in self.emotion_root.iterdir() if p.is_dir()])
+        chars = self.emotion_index.subdirs(self.emotion_root)
         self.char_combo["values"] = chars
 
         if not chars:
@@ -122,7 +143,7 @@ class ChatImageBuilder:
             return
 
         self.char_dir = self.emotion_root / name
-        if not self.char_dir.exists():
+        if self.char_dir not in self.emotion_index.dirs:
             self.listbox.delete(0, "end")
             self._clear_preview()
             self.status.config(text=f"폴더가 없습니다: {self.char_dir}")
@@ -142,9 +163,48 @@ class ChatImageBuilder:
         self.on_image_selected()
 
     def _scan_png(self, folder: Path) -> list[Path]:
-        out = [p for p in folder.iterdir() if p.is_file() and p.suffix.lower() == PNG_EXT]
-        out.sort(key=lambda p: p.name.lower())
-        return out
+        return [folder / name for name in self.emotion_index.files(folder)]
+
+    def _poll_fs(self):
+        changes = self.emotion_index.refresh((self.char_dir,) if self.char_dir else ())
+        if changes:
+            self._apply_fs_changes(changes)
+        self.root.after(WATCH_INTERVAL_MS, self._poll_fs)
+
+    def _apply_fs_changes(self, changes: Changes):
+        if changes.touches_dirs(self.emotion_root) or self.emotion_root in changes.dirs_removed:
+            chars = self.emotion_index.subdirs(self.emotion_root)
+            if self.char_var.get() not in chars:
+                self._show_character_list()
+                return
+            self.char_combo["values"] = chars
+
+        if self.char_dir is None or not changes.touches(self.char_dir):
+            return
+
+        # 목록 전체를 다시 만들지 않고 바뀐 항목만 Listbox에 반영한다
+        for path in sorted(changes.removed, reverse=True):
+            if path in self.image_paths:
+                idx = self.image_paths.index(path)
+                del self.image_paths[idx]
+                self.listbox.delete(idx)
+        for path in sorted(changes.added):
+            if path.parent != self.char_dir:
+                continue
+            key = path.name.lower()
+            idx = next((i for i, p in enumerate(self.image_paths) if p.name.lower() > key), len(self.image_paths))
+            self.image_paths.insert(idx, path)
+            self.listbox.insert(idx, path.name)
+
+        if not self.image_paths:
+            self._clear_preview()
+            self.status.config(text=f"{self.char_dir.name}: PNG가 없습니다.")
+            return
+        if not self.listbox.curselection():
+            self.listbox.selection_set(0)
+            self.on_image_selected()
+        elif self.preview_path in changes.changed:
+            self._render_preview(self.preview_path)
 
     def on_image_selected(self):
         sel = self.listbox.curselection()
@@ -159,9 +219,7 @@ class ChatImageBuilder:
 
     def _render_preview(self, img_path: Path):
         try:
-            img = Image.open(img_path)
-            if img.mode != "RGBA":
-                img = img.convert("RGBA")
+            img = open_rgba(img_path)
         except Exception as e:
             messagebox.showerror("오류", f"PNG 로드 실패:\n{img_path}\n{e}")
             return
@@ -172,7 +230,8 @@ class ChatImageBuilder:
         scale = min(cw / ow, ch / oh, 2.0)
         pw = max(1, int(ow * scale))
         ph = max(1, int(oh * scale))
-        preview = img.resize((pw, ph), Image.Resampling.LANCZOS)
+        with img:
+            preview = resize_image(img, (pw, ph), TIER_PREVIEW)
         self.preview_imgtk = ImageTk.PhotoImage(preview)
         self.canvas.delete("all")
         x0 = (cw - pw) // 2
@@ -197,7 +256,8 @@ class ChatImageBuilder:
         if not self.image_paths:
             messagebox.showwarning("안내", "이미지가 없습니다.")
             return
-        self._generate_images(self.image_paths)
+        # 같은 이름의 .png/.webp가 함께 있으면 같은 채팅 파일을 두 번 쓰지 않도록 하나만
+        self._generate_images(prefer_by_stem(self.image_paths))
 
     def _parse_int(self, raw: str, label: str) -> int | None:
         raw = raw.strip()
@@ -237,42 +297,36 @@ class ChatImageBuilder:
 
         out_char_dir = self.out_root / self.char_dir.name
         out_char_dir.mkdir(parents=True, exist_ok=True)
+        store = OutputStore(self.policy_var.get())
+        fmt = self.format_var.get()
+        ext = OUTPUT_FORMATS[fmt][0]
 
         success = 0
+        skipped = 0
         for img_path in img_paths:
             try:
-                img = Image.open(img_path)
-                if img.mode != "RGBA":
-                    img = img.convert("RGBA")
+                img = open_rgba(img_path)
             except Exception as e:
                 messagebox.showerror("오류", f"PNG 로드 실패:\n{img_path}\n{e}")
                 continue
 
-            if img.size != (img_w, img_h):
-                img = img.resize((img_w, img_h), Image.Resampling.LANCZOS)
-
-            margin = 50
-
-            out_left = Image.new("RGBA", (out_w, out_h), (0, 0, 0, 0))
-            x_left = margin
-            out_left.paste(img, (x_left, 0))
-
-            left_name = f"{img_path.stem}_left{img_path.suffix}"
-            out_left_path = next_available_path(out_char_dir, left_name)
-            out_left.save(out_left_path, format="PNG")
-            success += 1
-
-            out_right = Image.new("RGBA", (out_w, out_h), (0, 0, 0, 0))
-            x_right = out_w - img_w - margin
-            x_right = max(0, x_right)
-            out_right.paste(img, (x_right, 0))
-
-            right_name = f"{img_path.stem}_right{img_path.suffix}"
-            out_right_path = next_available_path(out_char_dir, right_name)
-            out_right.save(out_right_path, format="PNG")
-            success += 1
-
-        if success == 0:
+            # 캔버스는 크기별로 재사용하고, 원본은 얼굴을 만든 뒤 바로 닫는다
+            with img:
+                face = prepare_face(img, (img_w, img_h))
+                if face is img:
+                    face = img.copy()
+            canvas = chat_canvas((out_w, out_h))
+
+            for side in CHAT_SIDES:
+                x = side_offset(side, img_w, out_w, CHAT_MARGIN)
+                name = chat_variant_name(img_path.stem, side, ext)
+                _, status = store.write(out_char_dir, name, encode_image(canvas.place(face, x), fmt))
+                if status == STATUS_SAVED:
+                    success += 1
+                else:
+                    skipped += 1
+
+        if success == 0 and skipped == 0:
             messagebox.showwarning("안내", "생성된 이미지가 없습니다.")
             return
 
@@ -281,6 +335,7 @@ class ChatImageBuilder:
             f"생성 완료!\n"
             f"- 캐릭터: {self.char_dir.name}\n"
             f"- 처리한 이미지: {success}개\n"
+            f"- 건너뜀(동일 파일): {skipped}개\n"
             f"- 출력 폴더: {out_char_dir}"
         )
 
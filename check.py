@@ -1,11 +1,18 @@
+import argparse
+import json
+import os
+import threading
 import time
 import re
-from urllib.parse import urlencode
+from pathlib import Path
+from urllib.parse import urlencode, unquote
 
 import requests
-from bs4 import BeautifulSoup
 from tqdm import tqdm
 
+from main import filename_from_filetitle_or_url, safe_name, should_download_by_filename
+from profiling import InlineExecutor, add_profile_args, check_profile_workers, phase, profile_run
+
 
 BASE = "https://bluearchive.wiki"
 API = f"{BASE}/w/api.php"
@@ -17,20 +24,37 @@ HEADERS = {
 
 TIMEOUT = 30
 RATE_LIMIT_SEC = 0.25
+RETRY = 3
+RETRY_BACKOFF = 0.8
+
+# 감사(audit) 모드: 동시에 확인할 캐릭터 수. 요청 간격은 모든 스레드가 RATE_LIMIT_SEC를 함께 지킨다
+AUDIT_WORKERS = 4
+# imageinfo 한 번에 물어볼 파일 수 (MediaWiki 제한 50)
+IMAGEINFO_BATCH = 50
+
+LOG_HTTP = True
 
 
 def build_url(api: str, params: dict) -> str:
     return f"{api}?{urlencode(params, doseq=True)}"
 
 
+def rate_limit():
+    with phase("rate-limit"):
+        time.sleep(RATE_LIMIT_SEC)
+
+
 def http_get_json(session: requests.Session, url: str) -> dict:
     t0 = time.time()
-    r = session.get(url, timeout=TIMEOUT, headers=HEADERS)
+    with phase("network:api"):
+        r = session.get(url, timeout=TIMEOUT, headers=HEADERS)
+        data = r.json() if r.ok else None
     dt = time.time() - t0
-    print(f"[HTTP] GET {url}")
-    print(f"[HTTP] -> {r.status_code} ({dt:.2f}s) content-type={r.headers.get('content-type')}")
+    if LOG_HTTP:
+        print(f"[HTTP] GET {url}")
+        print(f"[HTTP] -> {r.status_code} ({dt:.2f}s) content-type={r.headers.get('content-type')}")
     r.raise_for_status()
-    return r.json()
+    return data
 
 
 def mw_api(session: requests.Session, params: dict) -> dict:
@@ -64,7 +88,14 @@ def get_section_html(session: requests.Session, page: str, section_index: str) -
 
 
 def extract_file_titles_from_html(html: str) -> list[str]:
-    soup = BeautifulSoup(html, "html.parser")
+    # bs4는 import가 무거워서 실제로 HTML을 파싱할 때 불러온다
+    from bs4 import BeautifulSoup
+
+    with phase("html"):
+        return _extract_file_titles(BeautifulSoup(html, "html.parser"))
+
+
+def _extract_file_titles(soup) -> list[str]:
     out = []
     for a in soup.select('a[href^="/wiki/File:"]'):
         href = a.get("href", "")
@@ -80,12 +111,233 @@ def extract_file_titles_from_html(html: str) -> list[str]:
     return uniq
 
 
-def main():
-    character_names = [
-        "Kayoko",
-        "Arisu",
-    ]
+class RateLimiter:
+    # 여러 스레드가 요청해도 전체 요청 사이 간격이 interval 이상이 되도록 차례를 나눠 준다
+    def __init__(self, interval: float = RATE_LIMIT_SEC):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            at = max(now, self.next_at)
+            self.next_at = at + self.interval
+        if at > now:
+            with phase("rate-limit"):
+                time.sleep(at - now)
+
+
+class AuditClient:
+    # 스레드마다 세션을 따로 쓰고, 모든 요청은 같은 RateLimiter를 거친다
+    def __init__(self, limiter: RateLimiter):
+        self.limiter = limiter
+        self.local = threading.local()
+
+    def session(self) -> requests.Session:
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+            session.headers.update(HEADERS)
+        return session
+
+    def api(self, params: dict) -> dict:
+        for attempt in range(1, RETRY + 1):
+            self.limiter.wait()
+            try:
+                return mw_api(self.session(), params)
+            except Exception as e:
+                if attempt == RETRY:
+                    raise
+                print(f"[AUDIT] {params.get('action')} attempt={attempt}/{RETRY} FAILED: {e}")
+                time.sleep(RETRY_BACKOFF * attempt)
+
+    def variants(self, char: str) -> dict[str, list[str]]:
+        # main.collect_sprites_by_variant와 같은 규칙. 실패를 빈 결과로 넘기지 않고 예외로 올린다
+        page = f"{char}/gallery"
+        data = self.api({"action": "parse", "page": page, "prop": "sections", "redirects": 1})
+        sections = data.get("parse", {}).get("sections", []) or []
+
+        sprites = None
+        for s in sections:
+            if (s.get("line") or "").strip().lower() == "sprites":
+                sprites = s
+                break
+        if not sprites:
+            return {}
+
+        sprites_level = int(sprites.get("level", 0))
+        subs = [s for s in sections if int(s.get("level", 0)) == sprites_level + 1]
+        targets = [("Sprites", sprites.get("index"))] if not subs else [
+            ((sub.get("line") or "").strip() or f"section_{sub.get('index')}", sub.get("index")) for sub in subs
+        ]
+
+        variants = {}
+        for name, idx in targets:
+            data = self.api({"action": "parse", "page": page, "prop": "text", "section": idx, "redirects": 1})
+            variants[name] = extract_file_titles_from_html(data["parse"]["text"]["*"])
+        return variants
+
+    def file_info(self, titles: list[str]) -> dict[str, tuple[str, int]]:
+        # 파일 제목 -> (원본 URL, 바이트 수). 파일마다 묻지 않고 IMAGEINFO_BATCH개씩 한 번에 묻는다
+        out = {}
+        for i in range(0, len(titles), IMAGEINFO_BATCH):
+            batch = titles[i:i + IMAGEINFO_BATCH]
+            sent = {unquote(t): t for t in batch}
+            data = self.api({"action": "query", "titles": "|".join(sent), "prop": "imageinfo", "iiprop": "url|size"})
+            query = data.get("query", {})
+            # API가 돌려주는 제목은 정규화돼 있으므로 (밑줄 -> 공백 등) 보낸 제목으로 되돌린다
+            normalized = {n["to"]: n["from"] for n in query.get("normalized", [])}
+            for page in query.get("pages", {}).values():
+                ii = page.get("imageinfo")
+                if not ii or "url" not in ii[0]:
+                    continue
+                title = page.get("title", "")
+                original = sent.get(normalized.get(title, title))
+                if original is not None:
+                    out[original] = (ii[0]["url"], int(ii[0].get("size", 0)))
+        return out
+
+
+def scan_local(images_root: Path) -> dict[str, int]:
+    # images/ 전체를 scandir로 한 번만 훑어서 "<캐릭터>/<섹션>/<파일>" -> 크기
+    out = {}
+    if not images_root.is_dir():
+        return out
+    with phase("fs:scan"):
+        stack = [(images_root, "")]
+        while stack:
+            folder, prefix = stack.pop()
+            with os.scandir(folder) as it:
+                for e in it:
+                    if e.name.startswith(".") or e.name.endswith(".part"):
+                        continue
+                    if e.is_dir():
+                        stack.append((Path(e.path), f"{prefix}{e.name}/"))
+                    elif e.is_file():
+                        out[f"{prefix}{e.name}"] = e.stat().st_size
+    return out
+
+
+def audit_char(client: AuditClient, char: str) -> dict[str, tuple[str, int]]:
+    # sync()가 내려받을 파일만 골라서 "<캐릭터>/<섹션>/<파일>" -> (URL, 크기)
+    expected = {}
+    titles = []
+    for variant, files in client.variants(char).items():
+        if char.lower() not in (variant or "").lower():
+            continue
+        variant_dir = safe_name(variant if variant else "Default")
+        titles.extend((variant_dir, t) for t in files if should_download_by_filename(char, t))
 
+    info = client.file_info(sorted({t for _, t in titles}))
+    for variant_dir, title in titles:
+        if title not in info:
+            continue
+        url, size = info[title]
+        expected[f"{safe_name(char)}/{variant_dir}/{filename_from_filetitle_or_url(title, url)}"] = (url, size)
+    return expected
+
+
+def compare(char: str, expected: dict[str, tuple[str, int]], local: dict[str, int]) -> dict:
+    prefix = f"{safe_name(char)}/"
+    mine = {k: v for k, v in local.items() if k.startswith(prefix)}
+    missing, mismatch = [], []
+    for rel, (url, size) in sorted(expected.items()):
+        have = mine.get(rel)
+        if not have:
+            missing.append({"path": rel, "url": url, "size": size})
+        elif size and have != size:
+            mismatch.append({"path": rel, "url": url, "size": size, "local_size": have})
+    extra = sorted(rel for rel in mine if rel not in expected)
+    return {
+        "remote": len(expected),
+        "local": len(mine),
+        "missing": missing,
+        "extra": extra,
+        "size_mismatch": mismatch,
+    }
+
+
+def audit(
+    character_names: list[str] | None,
+    images_root: Path,
+    report_path: Path,
+    workers: int = AUDIT_WORKERS,
+    interval: float = RATE_LIMIT_SEC,
+):
+    global LOG_HTTP
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    local = scan_local(images_root)
+    # 이름을 안 주면 images/에 이미 있는 캐릭터 폴더 전체
+    chars = character_names or sorted({rel.split("/", 1)[0] for rel in local}, key=str.lower)
+    print(f"[AUDIT] {len(local)} local files, {len(chars)} characters, workers={workers}, interval={interval}s")
+
+    client = AuditClient(RateLimiter(interval))
+    results: dict[str, dict] = {}
+    LOG_HTTP = False
+    t0 = time.perf_counter()
+    try:
+        with (ThreadPoolExecutor(max_workers=workers) if workers > 0 else InlineExecutor()) as ex:
+            futures = {ex.submit(audit_char, client, char): char for char in chars}
+            with tqdm(total=len(futures), desc="Audit") as bar:
+                for fut in as_completed(futures):
+                    char = futures[fut]
+                    try:
+                        results[char] = compare(char, fut.result(), local)
+                    except Exception as e:
+                        # 원격 목록을 못 얻은 캐릭터는 로컬 파일을 "extra"로 잘못 잡지 않도록 비교하지 않는다
+                        results[char] = {"error": str(e)}
+                        bar.write(f"[AUDIT] {char} FAILED: {e}")
+                    bar.update(1)
+    finally:
+        LOG_HTTP = True
+    elapsed = time.perf_counter() - t0
+
+    chars_out = {char: results[char] for char in sorted(results, key=str.lower)}
+    ok = [r for r in chars_out.values() if "error" not in r]
+    totals = {key: sum(len(r[key]) for r in ok) for key in ("missing", "extra", "size_mismatch")}
+    totals["failed_chars"] = len(chars_out) - len(ok)
+    redownload = [
+        {"path": (images_root / item["path"]).as_posix(), "url": item["url"], "size": item["size"]}
+        for r in ok for item in r["missing"] + r["size_mismatch"]
+    ]
+    report = {
+        "images_root": images_root.as_posix(),
+        "elapsed_sec": round(elapsed, 1),
+        "totals": totals,
+        "redownload": redownload,
+        "chars": chars_out,
+    }
+    report_path.write_text(json.dumps(report, ensure_ascii=False, indent=1), encoding="utf-8")
+
+    print(
+        f"[AUDIT] {len(chars_out)} characters in {elapsed:.1f}s: missing={totals['missing']} "
+        f"extra={totals['extra']} size_mismatch={totals['size_mismatch']} failed={totals['failed_chars']}"
+    )
+    print(f"[AUDIT] report -> {report_path} (다시 받기: python main.py --redownload {report_path})")
+
+
+DEFAULT_CHARACTERS = [
+    "Kayoko",
+    "Arisu",
+]
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="캐릭터 갤러리의 Sprites 섹션 구성 확인")
+    ap.add_argument("chars", nargs="*", help=f"캐릭터 이름 (생략하면 {', '.join(DEFAULT_CHARACTERS)})")
+    ap.add_argument("--audit", action="store_true",
+                    help="위키 파일 목록과 images/를 비교해 빠진/남는/크기가 다른 파일을 JSON으로 저장 (이름을 생략하면 images/의 전체 캐릭터)")
+    ap.add_argument("--images-root", type=Path, default=Path("images"))
+    ap.add_argument("--report", type=Path, default=Path("audit_report.json"))
+    ap.add_argument("--workers", type=int, default=None, help=f"동시에 확인할 캐릭터 수 (기본 {AUDIT_WORKERS}, --profile과 함께 쓸 수 없음)")
+    ap.add_argument("--interval", type=float, default=RATE_LIMIT_SEC, help="전체 요청 사이 최소 간격 (초)")
+    add_profile_args(ap, "profile_check.prof")
+    return ap
+
+
+def check(character_names: list[str]):
     session = requests.Session()
     session.headers.update(HEADERS)
 
@@ -98,7 +350,7 @@ def main():
         print(f"\n[{char}] page={page}")
 
         sections = get_sections(session, page)
-        time.sleep(RATE_LIMIT_SEC)
+        rate_limit()
 
         sprites = None
         for s in sections:
@@ -121,7 +373,7 @@ def main():
 
         if not subs:
             html = get_section_html(session, page, sprites_index)
-            time.sleep(RATE_LIMIT_SEC)
+            rate_limit()
             if not html:
                 print("  (Sprites section parse failed)")
                 continue
@@ -136,7 +388,7 @@ def main():
             sub_index = sub["index"]
 
             html = get_section_html(session, page, sub_index)
-            time.sleep(RATE_LIMIT_SEC)
+            rate_limit()
             if not html:
                 print(f"  ├─ {variant_name} (0)")
                 continue
@@ -146,7 +398,20 @@ def main():
             for f in files:
                 print(f"  │   └─ {f.split('File:', 1)[-1]}")
 
-        time.sleep(RATE_LIMIT_SEC)
+        rate_limit()
+
+
+def main(argv: list[str] | None = None):
+    ap = build_arg_parser()
+    args = ap.parse_args(argv)
+    # 단계별 프로파일은 한 스레드만 측정하므로 --profile이면 audit도 스레드 없이 실행
+    check_profile_workers(ap, args)
+    with profile_run(args.profile, args.profile_top, name="check"):
+        if args.audit:
+            workers = AUDIT_WORKERS if args.workers is None else args.workers
+            audit(args.chars, args.images_root, args.report, workers, args.interval)
+        else:
+            check(args.chars or DEFAULT_CHARACTERS)
 
 
 if __name__ == "__main__":
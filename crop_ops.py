@@ -0,0 +1,437 @@
+import argparse
+import json
+import os
+from pathlib import Path
+
+from PIL import Image, ImageChops, ImageStat
+
+from mem_budget import MemoryBudget, add_memory_args, image_cost, report_peak_rss, submit_bounded
+from output_store import (
+    FORMAT_PNG,
+    OUTPUT_POLICIES,
+    POLICY_SKIP,
+    STATUS_SAVED,
+    OutputStore,
+    add_format_arg,
+    encode_image,
+    output_name,
+)
+from profiling import add_profile_args, check_profile_workers, phase, process_pool, profile_run
+from resample import TIER_FINAL, add_resample_arg, resize_image
+from sprite_hash import load_duplicates
+from sprite_meta import SpriteMeta
+
+PNG_EXT = ".png"
+CROP_PARAMS_PATH = Path("./crop_params.json")
+
+MATCH_WORK_SIDE = 256
+MATCH_SEARCH_RADIUS = 24
+# 거친-고운 탐색: 피라미드 단계 수, 단계마다 다시 맞추는 범위(px), 다음 단계로 넘기는 후보 수
+MATCH_PYRAMID_LEVELS = 3
+MATCH_REFINE_RADIUS = 2
+MATCH_CANDIDATES = 3
+# 이보다 작게 줄인 템플릿은 특징이 사라져서 더 줄이지 않는다
+MATCH_MIN_TEMPLATE = 8
+MATCH_SCALE_RANGE = (0.5, 2.0)
+
+
+def scan_png(folder: Path, suffixes: tuple[str, ...] = (PNG_EXT,)) -> list[Path]:
+    out = [p for p in folder.iterdir() if p.is_file() and p.suffix.lower() in suffixes]
+    out.sort(key=lambda p: p.name.lower())
+    return out
+
+
+def scan_sections(char_dir: Path) -> list[str]:
+    secs = [p.name for p in char_dir.iterdir() if p.is_dir()]
+    secs.sort(key=lambda x: x.lower())
+    return secs
+
+
+def open_rgba(img_path: Path) -> Image.Image:
+    with phase("decode"):
+        src = Image.open(img_path)
+        src.load()
+        if src.mode == "RGBA":
+            return src
+        # 변환한 뒤 원본 디코딩 버퍼는 바로 놓는다
+        with src:
+            return src.convert("RGBA")
+
+
+def clamp_crop(x: int, y: int, crop_size: int, w: int, h: int) -> tuple[int, int]:
+    x = min(max(x, 0), max(0, w - crop_size))
+    y = min(max(y, 0), max(0, h - crop_size))
+    return x, y
+
+
+def alpha_bbox(img: Image.Image) -> tuple[int, int, int, int]:
+    bbox = img.getchannel("A").getbbox()
+    return bbox or (0, 0, img.width, img.height)
+
+
+def parse_output_sizes(raw: str) -> list[int]:
+    sizes = []
+    for part in raw.replace(" ", "").split(","):
+        if not part:
+            continue
+        val = int(part)
+        if val < 0:
+            raise ValueError(f"negative output size: {val}")
+        if val not in sizes:
+            sizes.append(val)
+    if not sizes:
+        raise ValueError("no output size")
+    return sizes
+
+
+def format_output_sizes(sizes: list[int] | tuple[int, ...]) -> str:
+    return ",".join(str(s) for s in sizes)
+
+
+def output_dir_for(out_root: Path, char: str, size: int, multi: bool) -> Path:
+    if not multi:
+        return out_root / char
+    return out_root.parent / f"{out_root.name}_{size}" / char
+
+
+def output_dirs_for(out_root: Path, char: str, output_sizes: list[int], crop_size: int) -> dict[int, Path]:
+    sizes: list[int] = []
+    for s in output_sizes:
+        if (s or crop_size) not in [x or crop_size for x in sizes]:
+            sizes.append(s)
+    multi = len(sizes) > 1
+    return {s: output_dir_for(out_root, char, s or crop_size, multi) for s in sizes}
+
+
+def load_crop_params(path: Path = CROP_PARAMS_PATH) -> dict[tuple[str, str], tuple[int, int, int, tuple[int, ...]]]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    out = {}
+    for char, sections in data.items():
+        for sec, p in sections.items():
+            out[(char, sec)] = (p["x"], p["y"], p["crop"], tuple(p.get("sizes") or (0,)))
+    return out
+
+
+def save_crop_params(state: dict[tuple[str, str], tuple[int, int, int, tuple[int, ...]]], path: Path = CROP_PARAMS_PATH):
+    data: dict[str, dict[str, dict]] = {}
+    for (char, sec), (x, y, cs, sizes) in sorted(state.items()):
+        data.setdefault(char, {})[sec] = {"x": x, "y": y, "crop": cs, "sizes": list(sizes)}
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def crop_region(img: Image.Image, crop_x: int, crop_y: int, crop_size: int) -> Image.Image:
+    x, y = clamp_crop(crop_x, crop_y, crop_size, img.width, img.height)
+    return img.crop((x, y, x + crop_size, y + crop_size))
+
+
+def resize_chain(
+    crop: Image.Image, crop_size: int, output_sizes: list[int], tier: str = TIER_FINAL
+) -> dict[int, Image.Image]:
+    # 큰 크기부터 줄여가며 직전 결과에서 다음 크기를 만든다 (확대한 결과는 다시 줄이지 않고 원본에서 만든다)
+    out: dict[int, Image.Image] = {}
+    prev = crop
+    for size in sorted(output_sizes, key=lambda s: s or crop_size, reverse=True):
+        if not size or size == crop_size:
+            out[size] = crop
+            continue
+        src = prev if size <= prev.width <= crop.width else crop
+        prev = resize_image(src, (size, size), tier)
+        out[size] = prev
+    return out
+
+
+def render_crop(
+    img_path: Path,
+    output_sizes: list[int],
+    crop_x: int,
+    crop_y: int,
+    crop_size: int,
+    tier: str = TIER_FINAL,
+    fmt: str = FORMAT_PNG,
+) -> dict[int, bytes]:
+    img = open_rgba(img_path)
+    with phase("resize"):
+        # crop만 남기고 전체 스프라이트 버퍼는 인코딩 전에 놓는다
+        with img:
+            crop = crop_region(img, crop_x, crop_y, crop_size)
+        resized = resize_chain(crop, crop_size, output_sizes, tier)
+    return {size: encode_image(resized[size], fmt) for size in output_sizes}
+
+
+def save_rendered(
+    store: OutputStore, img_path: Path, out_dirs: dict[int, Path], rendered: dict[int, bytes], fmt: str = FORMAT_PNG
+) -> int:
+    saved = 0
+    name = output_name(img_path.name, fmt)
+    for size, out_dir in out_dirs.items():
+        _, status = store.write(out_dir, name, rendered[size])
+        if status == STATUS_SAVED:
+            saved += 1
+    return saved
+
+
+def _match_gray(img: Image.Image) -> Image.Image:
+    bg = Image.new("RGBA", img.size, (128, 128, 128, 255))
+    bg.alpha_composite(img)
+    return bg.convert("L")
+
+
+def _downscale(img: Image.Image, factor: float) -> Image.Image:
+    w = max(1, int(round(img.width * factor)))
+    h = max(1, int(round(img.height * factor)))
+    return img.resize((w, h), Image.Resampling.BILINEAR)
+
+
+def _search_window(
+    template: Image.Image, image: Image.Image, cx: int, cy: int, radius: int, keep: int = 1
+) -> list[tuple[float, int, int]]:
+    # (cx, cy) 주변 ±radius의 모든 위치를 비교해서 점수(평균 차이)가 낮은 keep개를 돌려준다
+    tw, th = template.size
+    x_lo, x_hi = max(0, cx - radius), min(image.width - tw, cx + radius)
+    y_lo, y_hi = max(0, cy - radius), min(image.height - th, cy + radius)
+    scores = []
+    for y in range(y_lo, y_hi + 1):
+        for x in range(x_lo, x_hi + 1):
+            window = image.crop((x, y, x + tw, y + th))
+            scores.append((ImageStat.Stat(ImageChops.difference(template, window)).mean[0], x, y))
+    scores.sort()
+    return scores[:keep]
+
+
+def _match_template(template: Image.Image, image: Image.Image, cx: int, cy: int, radius: int) -> tuple[int, int, float]:
+    # 피라미드(2배씩 박스 축소)의 가장 작은 단계에서 넓게 찾고, 한 단계씩 키우며 ±MATCH_REFINE_RADIUS 안에서만 다시 맞춘다.
+    # 전체 창을 원래 크기로 훑는 (2r+1)^2번 대신 작은 창 몇 개만 비교한다
+    levels = [(template, image)]
+    while (
+        len(levels) < MATCH_PYRAMID_LEVELS
+        and min(levels[-1][0].size) >= 2 * MATCH_MIN_TEMPLATE
+    ):
+        t, img = levels[-1]
+        levels.append((t.reduce(2), img.reduce(2)))
+
+    top = len(levels) - 1
+    f = 2 ** top
+    t, img = levels[top]
+    candidates = _search_window(t, img, cx // f, cy // f, -(-radius // f), keep=MATCH_CANDIDATES)
+    for level in range(top - 1, -1, -1):
+        t, img = levels[level]
+        refined = []
+        for _, x, y in candidates:
+            refined.extend(_search_window(t, img, x * 2, y * 2, MATCH_REFINE_RADIUS))
+        # 거친 단계의 후보가 같은 자리로 모일 수 있으므로 겹치는 위치는 한 번만
+        candidates = sorted(set(refined))[:MATCH_CANDIDATES]
+
+    if not candidates:
+        return cx, cy, float("inf")
+    score, x, y = candidates[0]
+    return x, y, score
+
+
+def find_matching_crop(
+    ref_img: Image.Image,
+    ref_crop: tuple[int, int, int],
+    target_img: Image.Image,
+    ref_bbox: tuple[int, int, int, int] | None = None,
+    target_bbox: tuple[int, int, int, int] | None = None,
+) -> tuple[int, int, int]:
+    rx, ry, rcs = ref_crop
+    rl, rt, rr, rb = ref_bbox or alpha_bbox(ref_img)
+    tl, tt, tr, tb = target_bbox or alpha_bbox(target_img)
+
+    bbox_scale = (tb - tt) / max(1, rb - rt)
+    bbox_scale = min(max(bbox_scale, MATCH_SCALE_RANGE[0]), MATCH_SCALE_RANGE[1])
+
+    work = MATCH_WORK_SIDE / max(target_img.size)
+    ref_gray = _match_gray(ref_img)
+    target_small = _downscale(_match_gray(target_img), work)
+
+    best: tuple[int, int, int, float] | None = None
+    for scale in sorted({1.0, round(bbox_scale, 3)}):
+        cs = max(1, int(round(rcs * scale)))
+        # bbox 상단-중앙 기준 상대 위치를 스케일에 맞춰 옮긴 값이 초기 추정치
+        ref_cx = (rl + rr) / 2
+        est_x = int(round((tl + tr) / 2 + (rx - ref_cx) * scale))
+        est_y = int(round(tt + (ry - rt) * scale))
+
+        template = ref_gray.crop((rx, ry, rx + rcs, ry + rcs))
+        template = _downscale(template, work * cs / rcs)
+        if template.width >= target_small.width or template.height >= target_small.height:
+            continue
+
+        sx, sy, score = _match_template(
+            template, target_small,
+            int(round(est_x * work)), int(round(est_y * work)),
+            MATCH_SEARCH_RADIUS,
+        )
+        if best is None or score < best[3]:
+            best = (int(round(sx / work)), int(round(sy / work)), cs, score)
+
+    if best is None:
+        x, y = clamp_crop(rx, ry, rcs, target_img.width, target_img.height)
+        return x, y, rcs
+
+    x, y, cs, _ = best
+    x, y = clamp_crop(x, y, cs, target_img.width, target_img.height)
+    return x, y, cs
+
+
+def _match_section(
+    ref_path: Path,
+    ref_crop: tuple[int, int, int],
+    target_path: Path,
+    ref_bbox: tuple[int, int, int, int] | None = None,
+    target_bbox: tuple[int, int, int, int] | None = None,
+) -> tuple[int, int, int]:
+    return find_matching_crop(open_rgba(ref_path), ref_crop, open_rgba(target_path), ref_bbox, target_bbox)
+
+
+def propagate_crop(
+    char_dir: Path,
+    ref_section: str,
+    ref_crop: tuple[int, int, int],
+    max_workers: int | None = None,
+    meta: SpriteMeta | None = None,
+) -> dict[str, tuple[int, int, int]]:
+    from concurrent.futures import as_completed
+
+    ref_images = scan_png(char_dir / ref_section)
+    if not ref_images:
+        return {}
+    ref_path = ref_images[0]
+
+    out: dict[str, tuple[int, int, int]] = {ref_section: ref_crop}
+    targets: dict[str, Path] = {}
+    for sec in scan_sections(char_dir):
+        if sec == ref_section:
+            continue
+        pngs = scan_png(char_dir / sec)
+        if pngs:
+            targets[sec] = pngs[0]
+
+    # 메타데이터 인덱스에 있는 알파 bbox는 다시 계산하지 않는다 (없으면 워커가 구한다)
+    bboxes: dict[Path, tuple[int, int, int, int] | None] = {}
+    if meta is not None:
+        for p in (ref_path, *targets.values()):
+            info = meta.cached(p)
+            bboxes[p] = info.content_bbox() if info else None
+
+    with process_pool(max_workers) as ex:
+        futs = {
+            ex.submit(_match_section, ref_path, ref_crop, p, bboxes.get(ref_path), bboxes.get(p)): sec
+            for sec, p in targets.items()
+        }
+        for fut in as_completed(futs):
+            sec = futs[fut]
+            try:
+                out[sec] = fut.result()
+            except Exception as e:
+                print(f"[PROPAGATE] section='{sec}' FAILED: {e}")
+    return out
+
+
+def batch_crop(
+    jobs: list[tuple[Path, dict[int, Path], int, int, int]],
+    store: OutputStore,
+    max_workers: int | None = None,
+    duplicates: dict[Path, Path] | None = None,
+    budget: MemoryBudget | None = None,
+    tier: str = TIER_FINAL,
+    fmt: str = FORMAT_PNG,
+) -> tuple[int, int, int]:
+    ok, fail, skipped = 0, 0, 0
+    if not jobs:
+        return ok, fail, skipped
+
+    # 내용이 같은 원본은 같은 crop 조건이면 한 번만 렌더링하고 결과를 나눠 쓴다
+    groups: dict[tuple, list[tuple[Path, dict[int, Path]]]] = {}
+    for img_path, out_dirs, x, y, cs in jobs:
+        src = (duplicates or {}).get(img_path, img_path)
+        groups.setdefault((src, tuple(out_dirs), x, y, cs), []).append((img_path, out_dirs))
+
+    if max_workers is None:
+        max_workers = min(len(groups), os.cpu_count() or 1)
+    budget = budget or MemoryBudget()
+    with process_pool(max_workers) as ex:
+        # 인코딩은 워커에서, 파일 이름 결정과 쓰기는 디렉터리 인덱스를 가진 여기서 한다.
+        # 큰 스프라이트가 한꺼번에 디코딩되지 않게 메모리 예산 안에서만 제출한다
+        tasks = (
+            (members, image_cost(members[0][0]), render_crop, (members[0][0], list(sizes), x, y, cs, tier, fmt))
+            for (_, sizes, x, y, cs), members in groups.items()
+        )
+        for members, fut in submit_bounded(ex, tasks, budget):
+            try:
+                rendered = fut.result()
+            except Exception as e:
+                print(f"[CROP] {members[0][0].name} FAILED: {e}")
+                fail += len(members)
+                continue
+            for img_path, out_dirs in members:
+                try:
+                    if save_rendered(store, img_path, out_dirs, rendered, fmt):
+                        ok += 1
+                    else:
+                        skipped += 1
+                except Exception as e:
+                    print(f"[CROP] {img_path.name} FAILED: {e}")
+                    fail += 1
+    return ok, fail, skipped
+
+
+def saved_crop_jobs(
+    images_root: Path,
+    out_root: Path,
+    crop_params: dict[tuple[str, str], tuple[int, int, int, tuple[int, ...]]],
+    chars: list[str] | None = None,
+) -> list[tuple[Path, dict[int, Path], int, int, int]]:
+    jobs = []
+    for (char, sec), (x, y, cs, sizes) in sorted(crop_params.items()):
+        if chars and char not in chars:
+            continue
+        out_dirs = output_dirs_for(out_root, char, list(sizes), cs)
+        for img_path in scan_png(images_root / char / sec):
+            jobs.append((img_path, out_dirs, x, y, cs))
+    return jobs
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="face_cropper.py에서 저장한 섹션별 crop 위치로 일괄 crop")
+    ap.add_argument("chars", nargs="*", help="캐릭터 이름 (생략하면 저장된 전체)")
+    ap.add_argument("--images-root", type=Path, default=Path("./images"))
+    ap.add_argument("--out-root", type=Path, default=Path("./emotion"))
+    ap.add_argument("--params", type=Path, default=CROP_PARAMS_PATH)
+    ap.add_argument("--policy", choices=OUTPUT_POLICIES, default=POLICY_SKIP)
+    ap.add_argument("--workers", type=int, default=None, help="0이면 현재 프로세스에서 실행")
+    add_format_arg(ap)
+    add_resample_arg(ap)
+    add_memory_args(ap)
+    add_profile_args(ap, "profile_crop.prof")
+    return ap
+
+
+def main(argv: list[str] | None = None):
+    ap = build_arg_parser()
+    args = ap.parse_args(argv)
+    check_profile_workers(ap, args)
+    crop_params = load_crop_params(args.params)
+    if not crop_params:
+        raise SystemExit(f"저장된 crop 위치가 없습니다: {args.params}")
+
+    with profile_run(args.profile, args.profile_top, name="crop"):
+        with phase("scan"):
+            jobs = saved_crop_jobs(args.images_root, args.out_root, crop_params, args.chars or None)
+            duplicates = load_duplicates(args.images_root)
+        print(f"[CROP] {len(jobs)} images from {len({j[0].parent for j in jobs})} sections")
+        budget = MemoryBudget(args.memory_mb)
+        store = OutputStore(args.policy)
+        ok, fail, skipped = batch_crop(jobs, store, args.workers, duplicates, budget, args.resample, args.format)
+    print(f"[CROP] saved={ok} skipped={skipped} failed={fail} | {args.format}: {store.summary()}")
+    report_peak_rss("CROP", budget)
+
+
+if __name__ == "__main__":
+    main()
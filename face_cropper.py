@@ -3,21 +3,23 @@ from tkinter import ttk, messagebox
 from pathlib import Path
 from PIL import Image, ImageTk
 
-PNG_EXT = ".png"
-
-
-def next_available_path(dst_dir: Path, filename: str) -> Path:
-    base = Path(filename).stem
-    ext = Path(filename).suffix
-    candidate = dst_dir / filename
-    if not candidate.exists():
-        return candidate
-    i = 1
-    while True:
-        cand = dst_dir / f"{base}_{i}{ext}"
-        if not cand.exists():
-            return cand
-        i += 1
+from crop_ops import (
+    batch_crop,
+    format_output_sizes,
+    load_crop_params,
+    open_rgba,
+    output_dirs_for,
+    parse_output_sizes,
+    propagate_crop,
+    render_crop,
+    save_crop_params,
+    save_rendered,
+)
+from fs_watch import WATCH_INTERVAL_MS, Changes, TreeIndex
+from output_store import FORMAT_PNG, OUTPUT_FORMATS, OUTPUT_POLICIES, POLICY_SKIP, OutputStore
+from resample import TIER_PREVIEW, resize_image
+from sprite_hash import load_duplicates
+from sprite_meta import SpriteMeta
 
 
 class EmotionCropperPNG:
@@ -44,7 +46,7 @@ class EmotionCropperPNG:
         self.img_offset_y = 0
 
         self.crop_size = 200
-        self.output_size = 0
+        self.output_sizes: list[int] = [0]
 
         self.crop_x = 0
         self.crop_y = 0
@@ -55,10 +57,14 @@ class EmotionCropperPNG:
 
         self.rect_id = None
 
-        self.crop_state: dict[tuple[str, str], tuple[int, int, int, int]] = {}
+        self.crop_state: dict[tuple[str, str], tuple[int, int, int, tuple[int, ...]]] = load_crop_params()
+
+        self.images_index = TreeIndex(self.images_root, depth=2)
+        self.meta = SpriteMeta(self.images_root)
 
         self._build_ui()
-        self.refresh_character_list()
+        self._show_character_list()
+        self.root.after(WATCH_INTERVAL_MS, self._poll_fs)
 
     def _build_ui(self):
         top = tk.Frame(self.root)
@@ -78,6 +84,7 @@ class EmotionCropperPNG:
 
         tk.Button(top, text="새로고침", command=self.refresh_character_list).pack(side="left")
         tk.Button(top, text="변환 (emotion 저장)", command=self.process_section).pack(side="right")
+        tk.Button(top, text="전체 섹션 전파", command=self.propagate_all_sections).pack(side="right", padx=(0, 6))
 
         mid = tk.Frame(self.root)
         mid.pack(fill="x", padx=10, pady=(0, 6))
@@ -88,13 +95,25 @@ class EmotionCropperPNG:
         self.crop_entry.pack(side="left", padx=(4, 10))
 
         tk.Label(mid, text="Output Size:").pack(side="left")
-        self.out_entry = tk.Entry(mid, width=6)
+        self.out_entry = tk.Entry(mid, width=16)
         self.out_entry.insert(0, "0")
         self.out_entry.pack(side="left", padx=(4, 6))
-        tk.Label(mid, text="(0이면 리사이즈 없음)").pack(side="left", padx=(0, 10))
+        tk.Label(mid, text="(0이면 리사이즈 없음, 쉼표로 여러 크기)").pack(side="left", padx=(0, 10))
 
         tk.Button(mid, text="적용", command=self.apply_sizes).pack(side="left")
 
+        tk.Label(mid, text="저장 방식:").pack(side="left", padx=(16, 0))
+        self.policy_var = tk.StringVar(value=POLICY_SKIP)
+        ttk.Combobox(
+            mid, textvariable=self.policy_var, values=OUTPUT_POLICIES, state="readonly", width=10
+        ).pack(side="left", padx=(4, 0))
+
+        tk.Label(mid, text="형식:").pack(side="left", padx=(10, 0))
+        self.format_var = tk.StringVar(value=FORMAT_PNG)
+        ttk.Combobox(
+            mid, textvariable=self.format_var, values=list(OUTPUT_FORMATS), state="readonly", width=9
+        ).pack(side="left", padx=(4, 0))
+
         self.status = tk.Label(self.root, text="현재 폴더의 ./images 를 읽습니다.", anchor="w")
         self.status.pack(fill="x", padx=10, pady=(0, 6))
 
@@ -107,7 +126,11 @@ class EmotionCropperPNG:
         self.root.bind("<Configure>", self.on_resize)
 
     def refresh_character_list(self):
-        if not self.images_root.exists() or not self.images_root.is_dir():
+        self.images_index = TreeIndex(self.images_root, depth=2)
+        self._show_character_list()
+
+    def _show_character_list(self):
+        if self.images_root not in self.images_index.dirs:
             self.char_combo["values"] = []
             self.sec_combo["values"] = []
             self.char_var.set("")
@@ -116,7 +139,7 @@ class EmotionCropperPNG:
             self.status.config(text=f"./images 폴더를 찾지 못했습니다: {self.images_root.resolve()}")
             return
 
-        chars = sorted([p.name for p in self.images_root.iterdir() if p.is_dir()])
+        chars = self.images_index.subdirs(self.images_root)
         self.char_combo["values"] = chars
 
         if not chars:
@@ -131,8 +154,14 @@ class EmotionCropperPNG:
             self.char_var.set(chars[0])
         self.on_character_selected()
 
+    def _set_orig(self, img: Image.Image | None):
+        # 이전 원본 버퍼는 GC를 기다리지 않고 바로 놓는다
+        if self.orig_img is not None:
+            self.orig_img.close()
+        self.orig_img = img
+
     def clear_preview(self):
-        self.orig_img = None
+        self._set_orig(None)
         self.preview_imgtk = None
         self.canvas.delete("all")
         self.rect_id = None
@@ -146,28 +175,28 @@ class EmotionCropperPNG:
 
     def apply_sizes(self):
         cs = self._read_int(self.crop_entry, "Crop Size")
-        osz = self._read_int(self.out_entry, "Output Size")
-        if cs is None or osz is None:
+        if cs is None:
             return
         if cs <= 0:
             messagebox.showerror("입력 오류", "Crop Size는 1 이상이어야 합니다.")
             return
-        if osz < 0:
-            messagebox.showerror("입력 오류", "Output Size는 0 이상이어야 합니다.")
+        try:
+            sizes = parse_output_sizes(self.out_entry.get())
+        except ValueError:
+            messagebox.showerror("입력 오류", "Output Size는 0 이상의 정수를 쉼표로 구분해 입력하세요.")
             return
 
         self.crop_size = cs
-        self.output_size = osz
+        self.output_sizes = sizes
 
         self._save_state()
+        self._write_crop_params()
         if self.orig_img is not None:
             self._clamp_crop_to_image()
             self.render_preview()
 
     def _sections_under_char(self, char_dir: Path) -> list[str]:
-        secs = [p.name for p in char_dir.iterdir() if p.is_dir()]
-        secs.sort(key=lambda x: x.lower())
-        return secs
+        return self.images_index.subdirs(char_dir)
 
     def on_character_selected(self):
         name = self.char_var.get().strip()
@@ -189,9 +218,45 @@ class EmotionCropperPNG:
         self.on_section_selected()
 
     def _scan_png_in_dir(self, folder: Path) -> list[Path]:
-        out = [p for p in folder.iterdir() if p.is_file() and p.suffix.lower() == PNG_EXT]
-        out.sort(key=lambda p: p.name.lower())
-        return out
+        return [folder / name for name in self.images_index.files(folder)]
+
+    def _poll_fs(self):
+        changes = self.images_index.refresh((self.section_dir,) if self.section_dir else ())
+        if changes:
+            self._apply_fs_changes(changes)
+        self.root.after(WATCH_INTERVAL_MS, self._poll_fs)
+
+    def _apply_fs_changes(self, changes: Changes):
+        if changes.touches_dirs(self.images_root) or self.images_root in changes.dirs_removed:
+            chars = self.images_index.subdirs(self.images_root)
+            if self.char_var.get() not in chars:
+                self._show_character_list()
+                return
+            self.char_combo["values"] = chars
+
+        if self.char_dir is None:
+            return
+        if changes.touches_dirs(self.char_dir):
+            secs = self._sections_under_char(self.char_dir)
+            self.sec_combo["values"] = secs
+            if self.sec_var.get() not in secs:
+                self.on_character_selected()
+                return
+
+        if self.section_dir is None or not changes.touches(self.section_dir):
+            return
+        self.section_images = self._scan_png_in_dir(self.section_dir)
+        if not self.section_images:
+            self.clear_preview()
+            self.status.config(text=f"{self.char_dir.name}/{self.section_dir.name}: PNG가 없습니다.")
+            return
+        if self.preview_path not in self.section_images or self.preview_path in changes.changed:
+            self.preview_path = self.section_images[0]
+            self.load_preview(self.preview_path)
+        self.status.config(
+            text=f"캐릭터: {self.char_dir.name} | 섹션: {self.section_dir.name} | PNG {len(self.section_images)}개 | "
+                 f"미리보기: {self.preview_path.name}"
+        )
 
     def on_section_selected(self):
         if self.char_dir is None:
@@ -201,7 +266,7 @@ class EmotionCropperPNG:
             return
 
         self.section_dir = self.char_dir / sec
-        if not self.section_dir.exists():
+        if self.section_dir not in self.images_index.dirs:
             self.clear_preview()
             self.status.config(text=f"섹션 폴더가 없습니다: {self.section_dir}")
             return
@@ -230,7 +295,13 @@ class EmotionCropperPNG:
         k = self._state_key()
         if not k:
             return
-        self.crop_state[k] = (self.crop_x, self.crop_y, self.crop_size, self.output_size)
+        self.crop_state[k] = (self.crop_x, self.crop_y, self.crop_size, tuple(self.output_sizes))
+
+    def _write_crop_params(self):
+        try:
+            save_crop_params(self.crop_state)
+        except OSError as e:
+            print(f"[CROP] crop params save FAILED: {e}")
 
     def _load_state_or_center(self):
         k = self._state_key()
@@ -239,24 +310,22 @@ class EmotionCropperPNG:
         if k in self.crop_state:
             x, y, cs, osz = self.crop_state[k]
             self.crop_size = cs
-            self.output_size = osz
+            self.output_sizes = list(osz)
             self.crop_entry.delete(0, "end")
             self.crop_entry.insert(0, str(cs))
             self.out_entry.delete(0, "end")
-            self.out_entry.insert(0, str(osz))
+            self.out_entry.insert(0, format_output_sizes(osz))
             self.crop_x = x
             self.crop_y = y
 
     def load_preview(self, img_path: Path):
         try:
-            img = Image.open(img_path)
-            if img.mode != "RGBA":
-                img = img.convert("RGBA")
+            img = open_rgba(img_path)
         except Exception as e:
             messagebox.showerror("오류", f"PNG 로드 실패:\n{img_path}\n{e}")
             return
 
-        self.orig_img = img
+        self._set_orig(img)
         if self.crop_x == 0 and self.crop_y == 0:
             self._center_crop()
         self._clamp_crop_to_image()
@@ -265,9 +334,15 @@ class EmotionCropperPNG:
     def _center_crop(self):
         if self.orig_img is None:
             return
-        ow, oh = self.orig_img.size
-        self.crop_x = max(0, (ow - self.crop_size) // 2)
-        self.crop_y = max(0, (oh - self.crop_size) // 2)
+        # 투명 여백을 뺀 실제 그림 영역의 가운데에 맞춘다
+        # 인덱스에 없으면 이미 불러온 이미지에서 구한다 (빈 자리는 meta --refresh가 채운다)
+        info = self.meta.cached(self.preview_path) if self.preview_path else None
+        if info:
+            l, t, r, b = info.content_bbox()
+        else:
+            l, t, r, b = self.orig_img.getchannel("A").getbbox() or (0, 0, *self.orig_img.size)
+        self.crop_x = max(0, (l + r - self.crop_size) // 2)
+        self.crop_y = max(0, (t + b - self.crop_size) // 2)
 
     def on_resize(self, event):
         if self.orig_img is None:
@@ -289,7 +364,7 @@ class EmotionCropperPNG:
         self.preview_w = max(1, int(ow * scale))
         self.preview_h = max(1, int(oh * scale))
 
-        preview = self.orig_img.resize((self.preview_w, self.preview_h), Image.Resampling.LANCZOS)
+        preview = resize_image(self.orig_img, (self.preview_w, self.preview_h), TIER_PREVIEW)
         self.preview_imgtk = ImageTk.PhotoImage(preview)
 
         self.canvas.delete("all")
@@ -326,7 +401,7 @@ class EmotionCropperPNG:
         c = self.char_dir.name if self.char_dir else "-"
         s = self.section_dir.name if self.section_dir else "-"
         self.status.config(
-            text=f"캐릭터: {c} | 섹션: {s} | Crop={self.crop_size} | Output={self.output_size} | "
+            text=f"캐릭터: {c} | 섹션: {s} | Crop={self.crop_size} | Output={format_output_sizes(self.output_sizes)} | "
                  f"x={self.crop_x}, y={self.crop_y} | 원본={ow}x{oh}"
         )
 
@@ -374,6 +449,7 @@ class EmotionCropperPNG:
     def on_mouse_up(self, event):
         self.dragging = False
         self._save_state()
+        self._write_crop_params()
 
     def process_section(self):
         if self.char_dir is None or self.section_dir is None:
@@ -383,29 +459,37 @@ class EmotionCropperPNG:
             messagebox.showwarning("안내", "선택한 섹션에 PNG가 없습니다.")
             return
 
-        out_char_dir = self.out_root / self.char_dir.name
-        out_char_dir.mkdir(parents=True, exist_ok=True)
+        self._save_state()
+        self._write_crop_params()
+        out_dirs = output_dirs_for(self.out_root, self.char_dir.name, self.output_sizes, self.crop_size)
+
+        store = OutputStore(self.policy_var.get())
+        fmt = self.format_var.get()
+        duplicates = load_duplicates(self.images_root)
+        # 중복 원본의 렌더 결과는 마지막 사본을 저장할 때까지만 들고 있는다
+        users: dict[Path, int] = {}
+        for img_path in self.section_images:
+            src = duplicates.get(img_path, img_path)
+            users[src] = users.get(src, 0) + 1
+        rendered_by_src: dict[Path, dict[int, bytes]] = {}
 
         ok, fail, skipped = 0, 0, 0
 
         for img_path in self.section_images:
             try:
-                img = Image.open(img_path)
-                if img.mode != "RGBA":
-                    img = img.convert("RGBA")
-
-                ow, oh = img.size
-                x = min(max(self.crop_x, 0), max(0, ow - self.crop_size))
-                y = min(max(self.crop_y, 0), max(0, oh - self.crop_size))
-
-                crop = img.crop((x, y, x + self.crop_size, y + self.crop_size))
-
-                if self.output_size and self.output_size != self.crop_size:
-                    crop = crop.resize((self.output_size, self.output_size), Image.Resampling.LANCZOS)
-
-                out_path = next_available_path(out_char_dir, img_path.name)
-                crop.save(out_path, format="PNG")
-                ok += 1
+                src = duplicates.get(img_path, img_path)
+                users[src] -= 1
+                rendered = rendered_by_src.pop(src, None) if users[src] == 0 else rendered_by_src.get(src)
+                if rendered is None:
+                    rendered = render_crop(
+                        img_path, list(out_dirs), self.crop_x, self.crop_y, self.crop_size, fmt=fmt
+                    )
+                    if users[src] > 0:
+                        rendered_by_src[src] = rendered
+                if save_rendered(store, img_path, out_dirs, rendered, fmt):
+                    ok += 1
+                else:
+                    skipped += 1
             except Exception:
                 fail += 1
 
@@ -414,10 +498,57 @@ class EmotionCropperPNG:
             f"변환 완료!\n"
             f"- 캐릭터: {self.char_dir.name}\n"
             f"- 섹션: {self.section_dir.name}\n"
-            f"- 저장 폴더: {out_char_dir}\n"
+            f"- 저장 폴더: {', '.join(str(d) for d in out_dirs.values())}\n"
+            f"- 성공: {ok}\n"
+            f"- 실패: {fail}\n"
+            f"- 건너뜀(동일 파일): {skipped}\n"
+            f"(저장 방식: {store.policy})"
+        )
+
+    def propagate_all_sections(self):
+        if self.char_dir is None or self.section_dir is None:
+            messagebox.showwarning("안내", "캐릭터/섹션을 먼저 선택하세요.")
+            return
+        if not self.section_images:
+            messagebox.showwarning("안내", "선택한 섹션에 PNG가 없습니다.")
+            return
+
+        self._save_state()
+        char = self.char_dir.name
+        ref_section = self.section_dir.name
+        self.status.config(text=f"{char}: 섹션별 crop 위치 계산 중...")
+        self.root.update_idletasks()
+
+        crops = propagate_crop(self.char_dir, ref_section, (self.crop_x, self.crop_y, self.crop_size), meta=self.meta)
+
+        jobs = []
+        out_dirs_all: set[Path] = set()
+        for sec, (x, y, cs) in crops.items():
+            self.crop_state[(char, sec)] = (x, y, cs, tuple(self.output_sizes))
+            out_dirs = output_dirs_for(self.out_root, char, self.output_sizes, cs)
+            out_dirs_all.update(out_dirs.values())
+            for img_path in self._scan_png_in_dir(self.char_dir / sec):
+                jobs.append((img_path, out_dirs, x, y, cs))
+        self._write_crop_params()
+
+        self.status.config(text=f"{char}: {len(crops)}개 섹션, PNG {len(jobs)}개 변환 중...")
+        self.root.update_idletasks()
+        store = OutputStore(self.policy_var.get())
+        ok, fail, skipped = batch_crop(
+            jobs, store, duplicates=load_duplicates(self.images_root), fmt=self.format_var.get()
+        )
+
+        self._update_status()
+        messagebox.showinfo(
+            "완료",
+            f"전파 완료!\n"
+            f"- 캐릭터: {char}\n"
+            f"- 기준 섹션: {ref_section}\n"
+            f"- 처리한 섹션: {len(crops)}개\n"
+            f"- 저장 폴더: {', '.join(sorted(str(d) for d in out_dirs_all))}\n"
             f"- 성공: {ok}\n"
             f"- 실패: {fail}\n"
-            f"(동명 파일은 _1, _2로 자동 저장)"
+            f"- 건너뜀(동일 파일): {skipped}"
         )
 
 
@@ -0,0 +1,135 @@
+import os
+from pathlib import Path
+
+WATCH_INTERVAL_MS = 1000
+
+
+def scan_tree(root: Path, suffixes: tuple[str, ...] = (".png",)) -> dict[str, tuple[int, int]]:
+    # root 기준 상대 경로 -> (mtime, 크기), 숨김 폴더/파일은 건너뛴다
+    found: dict[str, tuple[int, int]] = {}
+    stack = [root]
+    while stack:
+        folder = stack.pop()
+        with os.scandir(folder) as it:
+            for e in it:
+                if e.name.startswith("."):
+                    continue
+                if e.is_dir():
+                    stack.append(Path(e.path))
+                elif e.is_file() and os.path.splitext(e.name)[1].lower() in suffixes:
+                    st = e.stat()
+                    found[Path(e.path).relative_to(root).as_posix()] = (st.st_mtime_ns, st.st_size)
+    return found
+
+
+class Changes:
+    def __init__(self):
+        self.added: set[Path] = set()
+        self.removed: set[Path] = set()
+        self.changed: set[Path] = set()
+        self.dirs_added: set[Path] = set()
+        self.dirs_removed: set[Path] = set()
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed or self.dirs_added or self.dirs_removed)
+
+    def touches(self, folder: Path) -> bool:
+        return any(p.parent == folder for p in (*self.added, *self.removed, *self.changed))
+
+    def touches_dirs(self, folder: Path) -> bool:
+        return any(p.parent == folder for p in (*self.dirs_added, *self.dirs_removed))
+
+
+class TreeIndex:
+    def __init__(self, root: Path, depth: int, suffixes: tuple[str, ...] = (".png",)):
+        self.root = root
+        self.depth = depth
+        self.suffixes = suffixes
+        # 폴더 -> (폴더 mtime, {파일 이름: (mtime, 크기)}, 하위 폴더 이름)
+        self.dirs: dict[Path, tuple[int, dict[str, tuple[int, int]], list[str]]] = {}
+        self.refresh()
+
+    def files(self, folder: Path) -> list[str]:
+        entry = self.dirs.get(folder)
+        return sorted(entry[1], key=str.lower) if entry else []
+
+    def subdirs(self, folder: Path) -> list[str]:
+        entry = self.dirs.get(folder)
+        return sorted(entry[2], key=str.lower) if entry else []
+
+    def refresh(self, stat_dirs: tuple[Path, ...] = ()) -> Changes:
+        # 폴더 mtime은 파일을 만들기/이름 바꾸기/지우기에만 바뀌고, 제자리 덮어쓰기(외부 편집기 등)에는 그대로다.
+        # 그래서 보통은 추가/삭제(와 atomic_write처럼 이름을 바꿔 쓰는 경우)만 잡고,
+        # stat_dirs로 준 폴더(화면에 보이는 폴더)만 파일마다 (mtime, 크기)를 다시 비교해 덮어쓰기도 잡는다
+        changes = Changes()
+        self._refresh_dir(self.root, 0, changes, set(stat_dirs))
+        return changes
+
+    def _scan(self, folder: Path, level: int) -> tuple[dict[str, tuple[int, int]], list[str]]:
+        files: dict[str, tuple[int, int]] = {}
+        subs: list[str] = []
+        with os.scandir(folder) as it:
+            for e in it:
+                if e.is_dir():
+                    if level < self.depth:
+                        subs.append(e.name)
+                elif e.is_file() and os.path.splitext(e.name)[1].lower() in self.suffixes:
+                    st = e.stat()
+                    files[e.name] = (st.st_mtime_ns, st.st_size)
+        return files, subs
+
+    def _stat_files(self, folder: Path, changes: Changes):
+        mtime, files, subs = self.dirs[folder]
+        for name, meta in files.items():
+            try:
+                st = os.stat(folder / name)
+            except OSError:
+                continue
+            if (st.st_mtime_ns, st.st_size) != meta:
+                files[name] = (st.st_mtime_ns, st.st_size)
+                changes.changed.add(folder / name)
+
+    def _refresh_dir(self, folder: Path, level: int, changes: Changes, stat_dirs: set[Path]):
+        old = self.dirs.get(folder)
+        try:
+            mtime = folder.stat().st_mtime_ns
+        except OSError:
+            self._drop(folder, changes)
+            return
+
+        # 폴더 mtime이 그대로면 항목 추가/삭제가 없으므로 다시 읽지 않는다
+        if old is None or old[0] != mtime:
+            try:
+                files, subs = self._scan(folder, level)
+            except OSError:
+                self._drop(folder, changes)
+                return
+            old_files = old[1] if old else {}
+            old_subs = set(old[2]) if old else set()
+            for name, meta in files.items():
+                if name not in old_files:
+                    changes.added.add(folder / name)
+                elif old_files[name] != meta:
+                    changes.changed.add(folder / name)
+            for name in old_files.keys() - files.keys():
+                changes.removed.add(folder / name)
+            for name in old_subs - set(subs):
+                self._drop(folder / name, changes)
+            for name in set(subs) - old_subs:
+                changes.dirs_added.add(folder / name)
+            self.dirs[folder] = (mtime, files, subs)
+        elif folder in stat_dirs:
+            self._stat_files(folder, changes)
+
+        for name in self.dirs[folder][2]:
+            self._refresh_dir(folder / name, level + 1, changes, stat_dirs)
+
+    def _drop(self, folder: Path, changes: Changes):
+        entry = self.dirs.pop(folder, None)
+        if entry is None:
+            return
+        changes.dirs_removed.add(folder)
+        for name in entry[1]:
+            changes.removed.add(folder / name)
+        for name in entry[2]:
+            self._drop(folder / name, changes)
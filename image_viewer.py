@@ -1,131 +1,447 @@
+import argparse
 import sys
 import os
+import io
+import hashlib
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from PyQt6.QtCore import Qt, QMimeData, QUrl, QEvent
+from PIL import Image
+from PyQt6.QtCore import (Qt, QMimeData, QUrl, QEvent, QAbstractListModel, QModelIndex, QSize, QBuffer, QIODevice,
+                          QObject, QRunnable, QThreadPool, QTimer, QFileSystemWatcher, pyqtSignal)
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                             QListWidget, QScrollArea, QGridLayout, QLabel)
-from PyQt6.QtGui import QPixmap, QImage, QKeySequence, QShortcut, QPainter, QPen
-
-
-class ImageCard(QLabel):
-    def __init__(self, emotion_image_path, chatimg_dir: Path, char_name: str, width, scale=0.5, parent=None):
+                             QListWidget, QListView, QLabel, QStyledItemDelegate, QStyle,
+                             QAbstractItemView, QLineEdit)
+from PyQt6.QtGui import QPixmap, QImage, QImageReader, QImageWriter, QKeySequence, QShortcut, QPainter, QPen, QColor
+
+from chat_compose import CHAT_IMG_SIZE, CHAT_MARGIN, CHAT_OUT_SIZE, chat_variant_name, compose_chat_image, prepare_face
+from fs_watch import TreeIndex
+from sprite_pack import SpritePack, open_pack, pack_entry
+from sprite_search import IMAGE_EXTS, SearchIndex
+from output_store import OUTPUT_EXTS, encode_png
+
+
+class ChatVariantCache:
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self.entries: OrderedDict[tuple[str, int, str], tuple[Path, bytes]] = OrderedDict()
+        self.tmp_dir = Path(tempfile.mkdtemp(prefix="ba_chatimg_"))
+        self._seq = 0
+
+    def get(self, emotion_path: Path, side: str) -> tuple[Path, bytes]:
+        entry = pack_entry(emotion_path)
+        st = entry[0].stat if entry else emotion_path.stat()
+        key = (str(emotion_path), st.st_mtime_ns, side)
+        hit = self.entries.get(key)
+        if hit is not None:
+            self.entries.move_to_end(key)
+            return hit
+
+        src = io.BytesIO(entry[0].read(entry[1])) if entry else emotion_path
+        with Image.open(src) as img:
+            # 이미 채팅 크기인 RGBA는 prepare_face가 원본을 그대로 돌려주므로 닫기 전에 합성한다
+            face = prepare_face(img, CHAT_IMG_SIZE)
+            data = encode_png(compose_chat_image(face, side, CHAT_OUT_SIZE, CHAT_MARGIN))
+
+        # 붙여넣을 때 원래 파일 이름이 보이도록 항목마다 하위 폴더를 둔다
+        self._seq += 1
+        entry_dir = self.tmp_dir / str(self._seq)
+        entry_dir.mkdir()
+        # 내용은 항상 PNG로 인코딩하므로 얼굴이 .webp/.jpg여도 확장자는 .png
+        out_path = entry_dir / chat_variant_name(emotion_path.stem, side, ".png")
+        out_path.write_bytes(data)
+
+        self.entries[key] = (out_path, data)
+        while len(self.entries) > self.max_entries:
+            _, (old_path, _) = self.entries.popitem(last=False)
+            shutil.rmtree(old_path.parent, ignore_errors=True)
+        return out_path, data
+
+    def close(self):
+        self.entries.clear()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+CARD_BASE_W, CARD_BASE_H = 370, 185
+CARD_SPACING = 15
+PATH_ROLE = Qt.ItemDataRole.UserRole
+CHAR_ROLE = Qt.ItemDataRole.UserRole + 1
+
+
+class EmotionListModel(QAbstractListModel):
+    def __init__(self, parent=None):
         super().__init__(parent)
-        self.emotion_path = Path(emotion_image_path).resolve()
-        self.chatimg_dir = Path(chatimg_dir).resolve()
-        self.char_name = char_name
-        self.scale = float(scale)
+        self.items: list[tuple[Path, str]] = []
+
+    def set_items(self, items: list[tuple[Path, str]]):
+        self.beginResetModel()
+        self.items = items
+        self.endResetModel()
+
+    def insert_item(self, item: tuple[Path, str]):
+        key = item[0].name.lower()
+        row = next((i for i, (p, _) in enumerate(self.items) if p.name.lower() > key), len(self.items))
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.items.insert(row, item)
+        self.endInsertRows()
+
+    def remove_path(self, path: Path):
+        for row, (p, _) in enumerate(self.items):
+            if p == path:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self.items[row]
+                self.endRemoveRows()
+                return
+
+    def refresh_path(self, path: Path):
+        for row, (p, _) in enumerate(self.items):
+            if p == path:
+                idx = self.index(row)
+                self.dataChanged.emit(idx, idx)
+                return
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.items)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not (0 <= index.row() < len(self.items)):
+            return None
+        path, char_name = self.items[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return path.name
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return f"{char_name}/{path.name}"
+        if role == PATH_ROLE:
+            return path
+        if role == CHAR_ROLE:
+            return char_name
+        return None
+
+
+THUMB_CACHE_DIR = Path("./.thumb_cache")
+THUMB_CACHE_MAX_BYTES = 256 * 1024 * 1024
+THUMB_MIN_BUCKET = 64
+
+
+def thumb_bucket(w: int, h: int) -> int:
+    bucket = THUMB_MIN_BUCKET
+    while bucket < max(w, h):
+        bucket *= 2
+    return bucket
+
+
+class ThumbnailDiskCache:
+    def __init__(self, cache_dir: Path = THUMB_CACHE_DIR, max_bytes: int = THUMB_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.fmt = "webp" if b"webp" in QImageWriter.supportedImageFormats() else "png"
+        self.lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.total_bytes = sum(e.stat().st_size for e in os.scandir(self.cache_dir) if e.is_file())
+
+    def _file(self, path: Path, st: os.stat_result, bucket: int) -> Path:
+        raw = f"{path.resolve()}|{st.st_mtime_ns}|{st.st_size}|{bucket}".encode("utf-8")
+        return self.cache_dir / f"{hashlib.sha1(raw).hexdigest()}.{self.fmt}"
+
+    def load(self, path: Path, st: os.stat_result, bucket: int) -> QImage | None:
+        f = self._file(path, st, bucket)
+        img = QImage(str(f))
+        if img.isNull():
+            return None
+        try:
+            os.utime(f)
+        except OSError:
+            pass
+        return img
+
+    def store(self, path: Path, st: os.stat_result, bucket: int, img: QImage):
+        f = self._file(path, st, bucket)
+        tmp = f.with_name(f"{f.stem}.{threading.get_ident()}.tmp")
+        if not img.save(str(tmp), self.fmt.upper(), 90 if self.fmt == "webp" else -1):
+            return
+        size = tmp.stat().st_size
+        os.replace(tmp, f)
+        with self.lock:
+            self.total_bytes += size
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # 가장 오래 쓰지 않은 파일부터 상한의 90%가 될 때까지 지운다
+        files = [e for e in os.scandir(self.cache_dir) if e.is_file()]
+        files.sort(key=lambda e: e.stat().st_mtime)
+        total = sum(e.stat().st_size for e in files)
+        target = int(self.max_bytes * 0.9)
+        for e in files:
+            if total <= target:
+                break
+            try:
+                size = e.stat().st_size
+                os.remove(e.path)
+                total -= size
+            except OSError:
+                pass
+        self.total_bytes = total
+
+
+class _ThumbnailSignals(QObject):
+    done = pyqtSignal(object, QImage, int, int)
+
+
+class ThumbnailJob(QRunnable):
+    def __init__(self, cache: "ThumbnailCache", key: tuple[Path, int, int], generation: int):
+        super().__init__()
+        self.cache = cache
+        self.key = key
+        self.generation = generation
 
-        self.setCursor(Qt.CursorShape.PointingHandCursor)
-        self.setStyleSheet("""
-            QLabel {
-                background-color: #f0f0f0; 
-                border: 2px solid #dddddd;
-                border-radius: 5px;
-            }
-            QLabel:hover {
-                border: 2px solid #999999;
-            }
-        """)
-        self.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.update_display_size(scale)
-        self.setContextMenuPolicy(Qt.ContextMenuPolicy.NoContextMenu)
-
-    def update_display_size(self, scale: float):
-        pad_x = 0
-        base_w, base_h = 370, 185
-
-        s = float(scale)
-        img_w = max(1, int(base_w * s))
-        img_h = max(1, int(base_h * s))
-
-        self.setFixedSize(img_w + 2 * pad_x, img_h)
-        self.load_thumbnail(img_w, img_h, pad_x)
-
-    def load_thumbnail(self, img_w, img_h, pad_x):
-        pix = QPixmap(str(self.emotion_path))
-        if pix.isNull():
+    def run(self):
+        if self.generation != self.cache.generation:
             return
+        path, w, h = self.key
+        entry = pack_entry(path)
+        if entry is not None:
+            # 팩 항목은 팩 파일의 mmap에서 바로 읽는다 (항목마다 stat/open 없음)
+            pack, name = entry
+            st = pack.stat
+            buf = QBuffer()
+            buf.setData(pack.read(name))
+            buf.open(QIODevice.OpenModeFlag.ReadOnly)
+            reader = QImageReader(buf)
+        else:
+            try:
+                st = path.stat()
+            except OSError:
+                return
+            reader = QImageReader(str(path))
+        reader.setAutoTransform(True)
+        src_size = reader.size()
+        if not src_size.isValid():
+            img = reader.read()
+            self.cache.signals.done.emit(self.key, img, thumb_bucket(img.width(), img.height()), self.generation)
+            return
+        target = src_size.scaled(w, h, Qt.AspectRatioMode.KeepAspectRatio)
+        bucket = thumb_bucket(target.width(), target.height())
+
+        disk = self.cache.disk
+        img = disk.load(path, st, bucket) if disk is not None else None
+        if img is None:
+            reader.setScaledSize(src_size.scaled(bucket, bucket, Qt.AspectRatioMode.KeepAspectRatio))
+            img = reader.read()
+            if not img.isNull() and disk is not None:
+                disk.store(path, st, bucket, img)
+        if self.generation != self.cache.generation:
+            return
+        self.cache.signals.done.emit(self.key, img, bucket, self.generation)
+
 
-        thumb = pix.scaled(
-            img_w, img_h,
-            Qt.AspectRatioMode.KeepAspectRatio,
-            Qt.TransformationMode.SmoothTransformation
+class ThumbnailCache(QObject):
+    updated = pyqtSignal()
+
+    def __init__(
+        self, max_entries: int = 256, max_bases: int = 256, disk: ThumbnailDiskCache | None = None, parent=None
+    ):
+        super().__init__(parent)
+        self.max_entries = max_entries
+        self.max_bases = max_bases
+        self.disk = disk
+        self.entries: OrderedDict[tuple[Path, int, int], QPixmap] = OrderedDict()
+        self.bases: OrderedDict[Path, tuple[int, QImage]] = OrderedDict()
+        self.pending: set[tuple[Path, int, int]] = set()
+        self.generation = 0
+        self.pool = QThreadPool(self)
+        self.signals = _ThumbnailSignals()
+        self.signals.done.connect(self._on_done)
+
+    def get(self, path: Path, w: int, h: int) -> QPixmap | None:
+        key = (path, w, h)
+        pix = self.entries.get(key)
+        if pix is not None:
+            self.entries.move_to_end(key)
+            return pix
+
+        # 줌 변경은 메모리에 있는 버킷 이미지를 다시 줄여서 처리하고, 버킷이 모자랄 때만 새로 읽는다
+        base = self.bases.get(path)
+        if base is not None:
+            self.bases.move_to_end(path)
+            bucket, img = base
+            pix = self._put(key, img)
+            if bucket >= thumb_bucket(pix.width(), pix.height()):
+                return pix
+        if key not in self.pending:
+            self.pending.add(key)
+            self.pool.start(ThumbnailJob(self, key, self.generation))
+        return pix
+
+    def _put(self, key: tuple[Path, int, int], img: QImage) -> QPixmap:
+        _, w, h = key
+        pix = QPixmap.fromImage(
+            img.scaled(w, h, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
         )
+        self.entries[key] = pix
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return pix
 
-        W, H = self.width(), self.height()
+    def _on_done(self, key, img: QImage, bucket: int, generation: int):
+        if generation != self.generation:
+            return
+        self.pending.discard(key)
+        if img.isNull():
+            return
+        path = key[0]
+        old = self.bases.get(path)
+        if old is None or old[0] <= bucket:
+            self.bases[path] = (bucket, img)
+            self.bases.move_to_end(path)
+            while len(self.bases) > self.max_bases:
+                self.bases.popitem(last=False)
+        self._put(key, img)
+        self.updated.emit()
+
+    def cancel_pending(self):
+        # 아직 시작하지 않은 작업은 큐에서 빼고, 실행 중인 작업은 세대 번호로 결과를 버린다
+        self.generation += 1
+        self.pool.clear()
+        self.pending.clear()
+
+    def invalidate(self, path: Path):
+        for key in [k for k in self.entries if k[0] == path]:
+            del self.entries[key]
+        self.bases.pop(path, None)
+
+    def clear(self):
+        self.cancel_pending()
+        self.entries.clear()
+        self.bases.clear()
+
+
+class CardDelegate(QStyledItemDelegate):
+    def __init__(self, thumbs: ThumbnailCache, scale: float = 1.0, parent=None):
+        super().__init__(parent)
+        self.thumbs = thumbs
+        self.scale = float(scale)
+
+    def card_size(self) -> QSize:
+        return QSize(max(1, int(CARD_BASE_W * self.scale)), max(1, int(CARD_BASE_H * self.scale)))
 
-        canvas = QPixmap(W, H)
-        canvas.fill(Qt.GlobalColor.transparent)
+    def sizeHint(self, option, index):
+        return self.card_size()
 
-        painter = QPainter(canvas)
+    def paint(self, painter, option, index):
+        rect = option.rect.adjusted(1, 1, -1, -1)
+        selected = bool(option.state & QStyle.StateFlag.State_Selected)
+        hover = bool(option.state & QStyle.StateFlag.State_MouseOver)
 
-        x = (W - thumb.width()) // 2
-        y = (H - thumb.height()) // 2
-        painter.drawPixmap(x, y, thumb)
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        if selected:
+            bg, border, border_w = QColor("#e6f7ff"), QColor("#1890ff"), 3
+        else:
+            bg, border, border_w = QColor("#f0f0f0"), QColor("#999999" if hover else "#dddddd"), 2
+        pen = QPen(border)
+        pen.setWidth(border_w)
+        painter.setPen(pen)
+        painter.setBrush(bg)
+        painter.drawRoundedRect(rect, 5, 5)
+
+        size = self.card_size()
+        thumb = self.thumbs.get(index.data(PATH_ROLE), size.width(), size.height())
+        if thumb is not None:
+            x = rect.x() + (rect.width() - thumb.width()) // 2
+            y = rect.y() + (rect.height() - thumb.height()) // 2
+            painter.drawPixmap(x, y, thumb)
+        else:
+            ph = min(size.width(), size.height()) - 8
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(QColor("#e4e4e4"))
+            painter.drawRoundedRect(
+                rect.x() + (rect.width() - ph) // 2, rect.y() + (rect.height() - ph) // 2, ph, ph, 4, 4
+            )
 
         pen = QPen(Qt.GlobalColor.lightGray)
         pen.setWidth(2)
         painter.setPen(pen)
-        x_mid = W // 2
-        painter.drawLine(x_mid, 0, x_mid, H)
-
-        painter.end()
-        self.setPixmap(canvas)
-
-    def mousePressEvent(self, event):
-        x = int(event.position().x())
-        side = "right" if x >= (self.width() // 2) else "left"
-        self.copy_variant_to_clipboard(side)
-        event.accept()
-        return
-
-    def copy_variant_to_clipboard(self, side: str):
-        stem = self.emotion_path.stem
-        suffix = self.emotion_path.suffix
-
-        target = (self.chatimg_dir / self.char_name / f"{stem}_{side}{suffix}").resolve()
-
-        if not target.exists():
-            self.window().statusBar().showMessage(f"대상 파일이 없음: {target.name}", 2500)
-            return
-
-        clipboard = QApplication.clipboard()
-        mime_data = QMimeData()
-        mime_data.setUrls([QUrl.fromLocalFile(str(target))])
-        clipboard.setMimeData(mime_data)
-
-        self.window().reset_selections()
-        self.setStyleSheet("""
-            QLabel {
-                background-color: #e6f7ff;
-                border: 3px solid #1890ff;
-                border-radius: 5px;
-            }
-        """)
-        self.window().statusBar().showMessage(
-            f"파일 복사 완료! ({side}) (Ctrl+V): {target.name}", 2000
-        )
-
-
+        x_mid = rect.x() + rect.width() // 2
+        painter.drawLine(x_mid, rect.top(), x_mid, rect.bottom())
+        painter.restore()
 
 
 class ViewerWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, pack_path: Path | None = None):
         super().__init__()
         self.setWindowTitle("ChatImg Viewer")
         self.resize(1400, 800)
         self.emotion_dir = Path("./emotion")
         self.chatimg_dir = Path("./chatimg")
         self.root_dir = self.emotion_dir
+        # 팩 파일을 열면 폴더 대신 팩 인덱스에서 캐릭터/이미지 목록을 읽는다 (감시 없음)
+        self.pack: SpritePack | None = None
+        if pack_path is not None:
+            self.pack = open_pack(pack_path)
+            self.emotion_dir = self.root_dir = pack_path
 
         self.scale = 1.0
         self.min_scale = 0.25
         self.max_scale = 3.0
         self.zoom_step = 0.1
 
+        self.variant_cache = ChatVariantCache()
+
+        self.zoom_timer = QTimer(self)
+        self.zoom_timer.setSingleShot(True)
+        self.zoom_timer.setInterval(40)
+        self.zoom_timer.timeout.connect(self._relayout_zoom)
+
+        self.char_dir: Path | None = None
+        self.char_index: TreeIndex | None = None
+        self.search_index: SearchIndex | None = None
+        # 검색 인덱스가 다루는 캐릭터 폴더 전체. 감시는 현재 폴더만 하므로 검색할 때마다 여기서 바뀐 것을 확인한다
+        self.search_tree: TreeIndex | None = None
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+
         self.init_ui()
         self.load_character_list()
 
+    def closeEvent(self, event):
+        self.thumbs.cancel_pending()
+        self.thumbs.pool.waitForDone()
+        self.variant_cache.close()
+        if self.pack is not None:
+            self.pack.close()
+        super().closeEvent(event)
+
+    def copy_variant_to_clipboard(self, emotion_path: Path, char_name: str, side: str) -> bool:
+        # chatimg는 --format에 따라 .png/.webp로 저장하므로 얼굴 파일 형식과 상관없이 둘 다 찾는다
+        exts = sorted(OUTPUT_EXTS, key=lambda ext: ext != emotion_path.suffix.lower())
+        name = chat_variant_name(emotion_path.stem, side, exts[0])
+        target = None
+        data = None
+        for ext in exts:
+            path = self.chatimg_dir / char_name / chat_variant_name(emotion_path.stem, side, ext)
+            if path.exists():
+                target = path.resolve()
+                break
+
+        if target is None:
+            try:
+                target, data = self.variant_cache.get(emotion_path, side)
+            except Exception as e:
+                self.statusBar().showMessage(f"이미지 생성 실패: {name} ({e})", 2500)
+                return False
+
+        mime_data = QMimeData()
+        mime_data.setUrls([QUrl.fromLocalFile(str(target))])
+        if data is not None:
+            mime_data.setData("image/png", data)
+        QApplication.clipboard().setMimeData(mime_data)
+
+        self.statusBar().showMessage(f"파일 복사 완료! ({side}) (Ctrl+V): {target.name}", 2000)
+        return True
+
     def init_ui(self):
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -147,18 +463,39 @@ class ViewerWindow(QMainWindow):
         self.lbl_info.setStyleSheet("font-size: 14px; margin-bottom: 5px;")
         right_layout.addWidget(self.lbl_info)
 
-        self.scroll = QScrollArea()
-        self.scroll.setWidgetResizable(True)
-        self.scroll.setStyleSheet("background-color: white; border: 1px solid #ccc;")
-        self.scroll.viewport().installEventFilter(self)
-
-        self.scroll_content = QWidget()
-        self.grid_layout = QGridLayout(self.scroll_content)
-        self.grid_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        self.grid_layout.setSpacing(15)
-
-        self.scroll.setWidget(self.scroll_content)
-        right_layout.addWidget(self.scroll)
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("🔍 전체 검색 (캐릭터 / 파일 이름)")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.textChanged.connect(self.on_search_changed)
+        right_layout.addWidget(self.search_edit)
+
+        try:
+            disk = ThumbnailDiskCache()
+        except OSError:
+            disk = None
+        self.thumbs = ThumbnailCache(disk=disk, parent=self)
+        self.thumbs.updated.connect(lambda: self.grid_view.viewport().update())
+        self.model = EmotionListModel(self)
+        self.delegate = CardDelegate(self.thumbs, self.scale, self)
+
+        self.grid_view = QListView()
+        self.grid_view.setViewMode(QListView.ViewMode.IconMode)
+        self.grid_view.setFlow(QListView.Flow.LeftToRight)
+        self.grid_view.setWrapping(True)
+        self.grid_view.setResizeMode(QListView.ResizeMode.Adjust)
+        self.grid_view.setMovement(QListView.Movement.Static)
+        self.grid_view.setUniformItemSizes(True)
+        self.grid_view.setLayoutMode(QListView.LayoutMode.Batched)
+        self.grid_view.setBatchSize(200)
+        self.grid_view.setSpacing(CARD_SPACING)
+        self.grid_view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.grid_view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.grid_view.setMouseTracking(True)
+        self.grid_view.setStyleSheet("background-color: white; border: 1px solid #ccc;")
+        self.grid_view.setModel(self.model)
+        self.grid_view.setItemDelegate(self.delegate)
+        self.grid_view.viewport().installEventFilter(self)
+        right_layout.addWidget(self.grid_view)
 
         main_layout.addLayout(left_layout)
         main_layout.addLayout(right_layout)
@@ -168,7 +505,7 @@ class ViewerWindow(QMainWindow):
         )
 
     def eventFilter(self, source, event):
-        if source == self.scroll.viewport() and event.type() == QEvent.Type.Wheel:
+        if source == self.grid_view.viewport() and event.type() == QEvent.Type.Wheel:
             if event.modifiers() & Qt.KeyboardModifier.ControlModifier:
                 delta = event.angleDelta().y()
                 if delta > 0:
@@ -176,8 +513,21 @@ class ViewerWindow(QMainWindow):
                 else:
                     self.zoom_out()
                 return True
+        if source == self.grid_view.viewport() and event.type() == QEvent.Type.MouseButtonPress:
+            pos = event.position().toPoint()
+            index = self.grid_view.indexAt(pos)
+            if index.isValid():
+                rect = self.grid_view.visualRect(index)
+                side = "right" if pos.x() >= rect.center().x() else "left"
+                self.on_card_click(index, side)
+            return True
         return super().eventFilter(source, event)
 
+    def on_card_click(self, index: QModelIndex, side: str):
+        if not self.copy_variant_to_clipboard(index.data(PATH_ROLE), index.data(CHAR_ROLE), side):
+            return
+        self.grid_view.setCurrentIndex(index)
+
     def keyPressEvent(self, event):
         if event.modifiers() & Qt.KeyboardModifier.ControlModifier:
             if event.key() in (Qt.Key.Key_Plus, Qt.Key.Key_Equal):
@@ -201,77 +551,164 @@ class ViewerWindow(QMainWindow):
 
     def apply_zoom(self):
         self.lbl_info.setText(f"🔍 Scale: {int(self.scale * 100)}%")
-        for i in range(self.grid_layout.count()):
-            widget = self.grid_layout.itemAt(i).widget()
-            if isinstance(widget, ImageCard):
-                widget.update_display_size(self.scale)
+        self.zoom_timer.start()
+
+    def _relayout_zoom(self):
+        # 휠 이벤트가 연달아 들어오면 마지막 배율로 한 번만 다시 배치한다
+        if self.delegate.scale == self.scale:
+            return
+        self.delegate.scale = self.scale
+        self.grid_view.doItemsLayout()
+        self.grid_view.viewport().update()
 
     def load_character_list(self):
         self.char_list_widget.clear()
+        if self.pack is not None:
+            self.char_list_widget.addItems(self.pack.chars())
+            return
         if not self.root_dir.exists():
             self.lbl_info.setText(f"오류: {self.root_dir} 폴더가 없습니다.")
             return
 
+        if str(self.root_dir) not in self.watcher.directories():
+            self.watcher.addPath(str(self.root_dir))
         chars = sorted([p.name for p in self.root_dir.iterdir() if p.is_dir()])
         if not chars:
             self.lbl_info.setText("표시할 캐릭터 폴더가 없습니다.")
             return
         self.char_list_widget.addItems(chars)
 
+    def on_directory_changed(self, path: str):
+        changed = Path(path)
+        if changed == self.root_dir:
+            self._sync_character_list()
+        elif changed == self.char_dir:
+            self._sync_images()
+
+    def on_search_changed(self, text: str):
+        if not text.strip():
+            if self.char_dir is not None:
+                self.load_images(self.char_dir)
+            else:
+                self.clear_grid()
+                self.lbl_info.setText("캐릭터를 선택해주세요.")
+            return
+
+        self._refresh_search_index()
+        results = self.search_index.search(text)
+        self.thumbs.cancel_pending()
+        self.model.set_items(results)
+        self.grid_view.scrollToTop()
+        self.lbl_info.setText(f"🔍 '{text.strip()}' - {len(results)}개의 이미지 (전체 {len(self.search_index)}개 중)")
+
+    def _refresh_search_index(self):
+        if self.pack is not None:
+            if self.search_index is None:
+                self.search_index = SearchIndex.from_items(
+                    [(self.root_dir / char / name, char) for char in self.pack.chars() for name in self.pack.files(char)]
+                )
+            return
+
+        if self.search_index is None or self.search_tree is None:
+            tree = self.search_tree = TreeIndex(self.root_dir, depth=1, suffixes=IMAGE_EXTS)
+            self.search_index = SearchIndex.from_items(
+                [(self.root_dir / char / name, char) for char in tree.subdirs(self.root_dir)
+                 for name in tree.files(self.root_dir / char)]
+            )
+            return
+
+        # 다른 캐릭터 폴더에서 crop/chatimg가 돌고 있어도 검색 결과가 맞도록, 폴더 mtime이 바뀐 곳만 다시 읽는다
+        changes = self.search_tree.refresh()
+        for path in changes.removed:
+            self.search_index.remove(path)
+        for path in changes.added:
+            if path.parent.parent == self.root_dir:
+                self.search_index.add(path, path.parent.name)
+
+    def _sync_character_list(self):
+        if not self.root_dir.exists():
+            self.load_character_list()
+            return
+        chars = sorted([p.name for p in self.root_dir.iterdir() if p.is_dir()])
+        shown = [self.char_list_widget.item(i).text() for i in range(self.char_list_widget.count())]
+        for row in reversed(range(len(shown))):
+            if shown[row] not in chars:
+                self.char_list_widget.takeItem(row)
+        for name in chars:
+            if name not in shown:
+                row = next((i for i in range(self.char_list_widget.count())
+                            if self.char_list_widget.item(i).text() > name), self.char_list_widget.count())
+                self.char_list_widget.insertItem(row, name)
+
+    def _sync_images(self):
+        # 바뀐 폴더 하나만 다시 읽고 추가/삭제/변경된 카드만 모델에 반영한다
+        if self.char_index is None or self.char_dir is None:
+            return
+        changes = self.char_index.refresh((self.char_dir,))
+        if self.search_edit.text().strip():
+            if changes:
+                self.on_search_changed(self.search_edit.text())
+            return
+        for path in changes.removed:
+            self.thumbs.invalidate(path)
+            self.model.remove_path(path)
+        for path in changes.added:
+            self.model.insert_item((path, self.char_dir.name))
+        for path in changes.changed:
+            self.thumbs.invalidate(path)
+            self.model.refresh_path(path)
+        if changes:
+            self.lbl_info.setText(f"📂 {self.char_dir.name} - {self.model.rowCount()}개의 이미지")
+
     def on_character_click(self, item):
         char_name = item.text()
         char_path = self.root_dir / char_name
+        if self.search_edit.text():
+            self.search_edit.blockSignals(True)
+            self.search_edit.clear()
+            self.search_edit.blockSignals(False)
         self.load_images(char_path)
 
     def load_images(self, folder_path):
-        self.clear_grid()
-        valid_ext = {'.png', '.jpg', '.jpeg'}
-        images = sorted([p for p in folder_path.iterdir() if p.suffix.lower() in valid_ext], key=lambda x: x.name)
-
-        self.lbl_info.setText(f"📂 {folder_path.name} - {len(images)}개의 이미지")
+        if self.pack is not None:
+            self.char_dir = folder_path
+            images = [folder_path / name for name in self.pack.files(folder_path.name)]
+            self.lbl_info.setText(f"📦 {folder_path.name} - {len(images)}개의 이미지")
+            self.thumbs.cancel_pending()
+            self.model.set_items([(p, folder_path.name) for p in images])
+            self.grid_view.scrollToTop()
+            return
 
-        cols = 3
-        row, col = 0, 0
-        for img_path in images:
-            card = ImageCard(
-                img_path,
-                self.chatimg_dir,
-                folder_path.name,
-                0,
-                scale=self.scale,
-            )
+        if self.char_dir is not None:
+            self.watcher.removePath(str(self.char_dir))
+        self.char_dir = folder_path
+        self.char_index = TreeIndex(folder_path, depth=0, suffixes=IMAGE_EXTS)
+        self.watcher.addPath(str(folder_path))
+        images = [folder_path / name for name in self.char_index.files(folder_path)]
 
-            self.grid_layout.addWidget(card, row, col)
-            col += 1
-            if col >= cols:
-                col = 0
-                row += 1
+        self.lbl_info.setText(f"📂 {folder_path.name} - {len(images)}개의 이미지")
+        self.thumbs.cancel_pending()
+        self.model.set_items([(p, folder_path.name) for p in images])
+        self.grid_view.scrollToTop()
 
     def clear_grid(self):
-        while self.grid_layout.count():
-            child = self.grid_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
+        self.model.set_items([])
 
     def reset_selections(self):
-        for i in range(self.grid_layout.count()):
-            widget = self.grid_layout.itemAt(i).widget()
-            if widget:
-                widget.setStyleSheet("""
-                    QLabel {
-                        background-color: #f0f0f0; 
-                        border: 2px solid #dddddd;
-                        border-radius: 5px;
-                    }
-                    QLabel:hover {
-                        border: 2px solid #999999;
-                    }
-                """)
+        self.grid_view.clearSelection()
 
 
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
+def main(argv: list[str] | None = None):
+    ap = argparse.ArgumentParser(description="감정 이미지 뷰어 (클릭하면 채팅 이미지를 클립보드로 복사)")
+    ap.add_argument("--pack", type=Path, default=None, help="sprite_pack.py로 만든 팩 파일에서 읽기")
+    args = ap.parse_args(argv)
+
+    app = QApplication(sys.argv[:1])
     app.setStyle("Fusion")
-    viewer = ViewerWindow()
+    viewer = ViewerWindow(args.pack)
     viewer.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    sys.exit(app.exec())
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
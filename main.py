@@ -1,12 +1,16 @@
+import argparse
+import json
+import os
 import time
 import re
 from pathlib import Path
 from urllib.parse import urlencode, urlparse, unquote
 
 import requests
-from bs4 import BeautifulSoup
 from tqdm import tqdm
 
+from profiling import add_profile_args, phase, profile_run
+
 
 BASE = "https://bluearchive.wiki"
 API = f"{BASE}/w/api.php"
@@ -41,14 +45,21 @@ def build_url(api: str, params: dict) -> str:
     return f"{api}?{urlencode(params, doseq=True)}"
 
 
+def rate_limit():
+    with phase("rate-limit"):
+        time.sleep(RATE_LIMIT_SEC)
+
+
 def http_get_json(session: requests.Session, url: str) -> dict:
     t0 = time.time()
-    r = session.get(url, timeout=TIMEOUT, headers=HEADERS)
+    with phase("network:api"):
+        r = session.get(url, timeout=TIMEOUT, headers=HEADERS)
+        data = r.json() if r.ok else None
     dt = time.time() - t0
     print(f"[HTTP] GET {url}")
     print(f"[HTTP] -> {r.status_code} ({dt:.2f}s) content-type={r.headers.get('content-type')}")
     r.raise_for_status()
-    return r.json()
+    return data
 
 
 def mw_api(session: requests.Session, params: dict) -> dict:
@@ -84,7 +95,14 @@ def get_section_html(session: requests.Session, page: str, section_index: str) -
 
 
 def extract_file_titles_from_html(html: str) -> list[str]:
-    soup = BeautifulSoup(html, "html.parser")
+    # bs4는 import가 무거워서 실제로 HTML을 파싱할 때 불러온다
+    from bs4 import BeautifulSoup
+
+    with phase("html"):
+        return _extract_file_titles(BeautifulSoup(html, "html.parser"))
+
+
+def _extract_file_titles(soup) -> list[str]:
     out = []
     for a in soup.select('a[href^="/wiki/File:"]'):
         href = a.get("href", "")
@@ -144,17 +162,19 @@ def download_file(session: requests.Session, url: str, out_path: Path) -> bool:
     for attempt in range(1, RETRY + 1):
         try:
             t0 = time.time()
-            r = session.get(url, stream=True, timeout=TIMEOUT, headers=HEADERS)
-            dt = time.time() - t0
-            print(f"[DL] GET {url}")
-            print(f"[DL] -> {r.status_code} ({dt:.2f}s) content-type={r.headers.get('content-type')}")
-            r.raise_for_status()
-            tmp_path = out_path.with_suffix(out_path.suffix + ".part")
-            with open(tmp_path, "wb") as f:
-                for chunk in r.iter_content(chunk_size=1024 * 256):
-                    if chunk:
-                        f.write(chunk)
-            tmp_path.replace(out_path)
+            with phase("network:download"):
+                r = session.get(url, stream=True, timeout=TIMEOUT, headers=HEADERS)
+                dt = time.time() - t0
+                print(f"[DL] GET {url}")
+                print(f"[DL] -> {r.status_code} ({dt:.2f}s) content-type={r.headers.get('content-type')}")
+                r.raise_for_status()
+                # 같은 파일을 받는 다른 프로세스와 .part가 겹치지 않게 pid를 붙인다
+                tmp_path = out_path.with_suffix(out_path.suffix + f".{os.getpid()}.part")
+                with open(tmp_path, "wb") as f:
+                    for chunk in r.iter_content(chunk_size=1024 * 256):
+                        if chunk:
+                            f.write(chunk)
+                tmp_path.replace(out_path)
             return True
         except Exception as e:
             print(f"[DL] FAILED attempt={attempt}/{RETRY}: {e}")
@@ -162,10 +182,23 @@ def download_file(session: requests.Session, url: str, out_path: Path) -> bool:
     return False
 
 
+def fetch_bytes(session: requests.Session, url: str) -> bytes | None:
+    for attempt in range(1, RETRY + 1):
+        try:
+            with phase("network:download"):
+                r = session.get(url, timeout=TIMEOUT, headers=HEADERS)
+                r.raise_for_status()
+                return r.content
+        except Exception as e:
+            print(f"[DL] {url} FAILED attempt={attempt}/{RETRY}: {e}")
+            time.sleep(RETRY_BACKOFF * attempt)
+    return None
+
+
 def collect_sprites_by_variant(session: requests.Session, char: str) -> dict[str, list[str]]:
     page = f"{char}/gallery"
     sections = get_sections(session, page)
-    time.sleep(RATE_LIMIT_SEC)
+    rate_limit()
 
     sprites = None
     for s in sections:
@@ -187,7 +220,7 @@ def collect_sprites_by_variant(session: requests.Session, char: str) -> dict[str
 
     if not sub_sections:
         html = get_section_html(session, page, sprites_index)
-        time.sleep(RATE_LIMIT_SEC)
+        rate_limit()
         if not html:
             return {}
         files = extract_file_titles_from_html(html)
@@ -198,7 +231,7 @@ def collect_sprites_by_variant(session: requests.Session, char: str) -> dict[str
         variant_name = (sub.get("line") or "").strip() or f"section_{sub.get('index')}"
         idx = sub.get("index")
         html = get_section_html(session, page, idx)
-        time.sleep(RATE_LIMIT_SEC)
+        rate_limit()
         if not html:
             variants[variant_name] = []
             continue
@@ -208,12 +241,22 @@ def collect_sprites_by_variant(session: requests.Session, char: str) -> dict[str
     return variants
 
 
-def main():
-    character_names = [
-        "Rin"
-    ]
+DEFAULT_CHARACTERS = [
+    "Rin"
+]
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="Blue Archive 위키에서 캐릭터 스프라이트 다운로드")
+    ap.add_argument("chars", nargs="*", help=f"캐릭터 이름 (생략하면 {', '.join(DEFAULT_CHARACTERS)})")
+    ap.add_argument("--out-root", type=Path, default=Path("images"))
+    ap.add_argument("--redownload", type=Path, default=None,
+                    help="check.py --audit 보고서의 빠진/크기가 다른 파일만 다시 받기")
+    add_profile_args(ap, "profile_sync.prof")
+    return ap
 
-    root_out = Path("images")
+
+def sync(character_names: list[str], root_out: Path):
     root_out.mkdir(parents=True, exist_ok=True)
 
     session = requests.Session()
@@ -250,7 +293,7 @@ def main():
                     continue
 
                 url = get_file_direct_url(session, file_title)
-                time.sleep(RATE_LIMIT_SEC)
+                rate_limit()
                 if not url:
                     print(f"  │   └─ (skip:no-url) {fname}")
                     continue
@@ -262,12 +305,41 @@ def main():
                     continue
 
                 ok = download_file(session, url, out_path)
-                time.sleep(RATE_LIMIT_SEC)
+                rate_limit()
                 if ok:
                     print(f"  │   └─ (saved)  {out_path.name}")
                 else:
                     print(f"  │   └─ (fail)   {out_path.name}")
 
 
+def redownload(report_path: Path):
+    # 감사 보고서에 이미 URL과 저장 경로가 있으므로 갤러리/imageinfo를 다시 묻지 않는다
+    items = json.loads(report_path.read_text(encoding="utf-8")).get("redownload", [])
+    session = requests.Session()
+    session.headers.update(HEADERS)
+
+    ok = fail = 0
+    for item in tqdm(items, desc="Redownload"):
+        out_path = Path(item["path"])
+        if download_file(session, item["url"], out_path):
+            ok += 1
+            size = out_path.stat().st_size
+            if item.get("size") and size != item["size"]:
+                print(f"[DL] {out_path} size {size} != expected {item['size']}")
+        else:
+            fail += 1
+        rate_limit()
+    print(f"[DL] redownload: saved={ok} failed={fail} (from {report_path})")
+
+
+def main(argv: list[str] | None = None):
+    args = build_arg_parser().parse_args(argv)
+    with profile_run(args.profile, args.profile_top, name="sync"):
+        if args.redownload:
+            redownload(args.redownload)
+        else:
+            sync(args.chars or DEFAULT_CHARACTERS, args.out_root)
+
+
 if __name__ == "__main__":
     main()
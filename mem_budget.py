@@ -0,0 +1,150 @@
+import argparse
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO
+
+from PIL import Image
+
+MEMORY_BUDGET_MB = 1024
+# 원본 디코딩 + RGBA 변환/crop 사본까지 대략 원본 RGBA 크기의 두 배를 잡는다
+DECODE_COPIES = 2
+
+_MB = 1024 * 1024
+
+
+def image_cost(src: Path | BinaryIO) -> int:
+    # 헤더만 읽어서 디코딩했을 때의 크기를 추정한다
+    try:
+        with Image.open(src) as img:
+            w, h = img.size
+    except Exception:
+        return 0
+    finally:
+        if not isinstance(src, Path):
+            src.seek(0)
+    return w * h * 4 * DECODE_COPIES
+
+
+class MemoryBudget:
+    def __init__(self, limit_mb: int = MEMORY_BUDGET_MB):
+        self.limit = max(1, limit_mb) * _MB
+        self.used = 0
+        self.peak = 0
+        self.cond = threading.Condition()
+
+    def fits(self, cost: int) -> bool:
+        # 예산보다 큰 이미지 하나는 혼자일 때만 들어간다
+        return self.used == 0 or self.used + cost <= self.limit
+
+    def acquire(self, cost: int):
+        with self.cond:
+            while not self.fits(cost):
+                self.cond.wait()
+            self.used += cost
+            self.peak = max(self.peak, self.used)
+
+    def release(self, cost: int):
+        with self.cond:
+            self.used -= cost
+            self.cond.notify_all()
+
+    @contextmanager
+    def reserve(self, cost: int):
+        self.acquire(cost)
+        try:
+            yield
+        finally:
+            self.release(cost)
+
+    def summary(self) -> str:
+        return f"budget {self.limit / _MB:.0f}MB, peak reserved {self.peak / _MB:.1f}MB"
+
+
+def submit_bounded(ex, tasks, budget: MemoryBudget):
+    # tasks: (key, cost, fn, args). 예산 안에 들어가는 만큼만 제출하고, 끝난 작업부터 (key, future)로 돌려준다
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    pending: dict = {}
+
+    def drain(block: bool = True):
+        if block:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        else:
+            done = [fut for fut in pending if fut.done()]
+        for fut in done:
+            key, cost = pending.pop(fut)
+            budget.release(cost)
+            yield key, fut
+
+    for key, cost, fn, args in tasks:
+        while pending and not budget.fits(cost):
+            yield from drain()
+        budget.acquire(cost)
+        pending[ex.submit(fn, *args)] = (key, cost)
+        # 이미 끝난 작업(인라인 실행 포함)은 바로 돌려줘서 예산을 비운다
+        yield from drain(block=False)
+    while pending:
+        yield from drain()
+
+
+def _peak_rss_windows() -> int | None:
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+            (name, ctypes.c_size_t)
+            for name in (
+                "PeakWorkingSetSize",
+                "WorkingSetSize",
+                "QuotaPeakPagedPoolUsage",
+                "QuotaPagedPoolUsage",
+                "QuotaPeakNonPagedPoolUsage",
+                "QuotaNonPagedPoolUsage",
+                "PagefileUsage",
+                "PeakPagefileUsage",
+            )
+        ]
+
+    try:
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+    except Exception:
+        return None
+
+
+def peak_rss() -> tuple[int | None, int | None]:
+    # (현재 프로세스, 끝난 워커 프로세스 중 가장 큰 것). 워커 값은 풀이 닫힌 뒤에만 잡힌다
+    try:
+        import resource
+    except ImportError:
+        return _peak_rss_windows(), None
+    # ru_maxrss 단위: macOS는 바이트, 리눅스는 KB
+    scale = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return own, children or None
+
+
+def report_peak_rss(tag: str, budget: MemoryBudget | None = None):
+    own, children = peak_rss()
+    if own is None:
+        line = f"[{tag}] peak RSS n/a"
+    else:
+        line = f"[{tag}] peak RSS {own / _MB:.1f}MB"
+        if children:
+            line += f" (largest worker {children / _MB:.1f}MB)"
+    if budget is not None:
+        line += f" | {budget.summary()}"
+    print(line)
+
+
+def add_memory_args(ap: argparse.ArgumentParser):
+    ap.add_argument("--memory-mb", type=int, default=MEMORY_BUDGET_MB,
+                    help="동시에 디코딩 중인 이미지의 예상 메모리 한도 (MB)")
@@ -1,8 +1,12 @@
 import os
 import tkinter as tk
+from pathlib import Path
 from tkinter import filedialog, messagebox
 from PIL import Image
 
+from output_store import FORMAT_PNG, FORMAT_WEBP, atomic_write, encode_image
+from overlay_batch import composite_pair
+
 class OverlayApp:
     def __init__(self, root):
         self.root = root
@@ -46,36 +50,45 @@ class OverlayApp:
             return
 
         try:
-            img1 = Image.open(p1).convert("RGBA")
-            img2 = Image.open(p2).convert("RGBA")
+            img1 = Image.open(p1)
+            img2 = Image.open(p2)
+            img1.load()
+            img2.load()
         except Exception as e:
             messagebox.showerror("Error", f"이미지 로딩 실패:\n{e}")
             return
 
-        if img1.size != img2.size:
-            messagebox.showerror("Error",
-                f"사이즈가 다름.\nImage1: {img1.size}\nImage2: {img2.size}")
-            return
+        # 합성 결과만 남기고 원본 두 장은 바로 닫는다
+        with img1, img2:
+            if img1.size != img2.size:
+                messagebox.showerror("Error",
+                    f"사이즈가 다름.\nImage1: {img1.size}\nImage2: {img2.size}")
+                return
 
-        # 정확한 알파 합성
-        merged = Image.alpha_composite(img1, img2)
+            # 정확한 알파 합성
+            merged = composite_pair(img1, img2)
 
         default_name = "overlay_result.png"
         save_path = filedialog.asksaveasfilename(
             defaultextension=".png",
             initialfile=default_name,
-            filetypes=[("PNG Files", "*.png")]
+            filetypes=[("PNG Files", "*.png"), ("WebP (lossless)", "*.webp")]
         )
 
         if not save_path:
             return
 
-        merged.save(save_path)
+        fmt = FORMAT_WEBP if save_path.lower().endswith(".webp") else FORMAT_PNG
+        atomic_write(Path(save_path), encode_image(merged, fmt))
         messagebox.showinfo("Done", f"저장 완료:\n{save_path}")
 
 
-if __name__ == "__main__":
+def main():
     # pip install pillow 필요
     root = tk.Tk()
     app = OverlayApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+import argparse
+import io
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from PIL import Image
+
+from profiling import phase
+
+POLICY_SKIP = "skip"
+POLICY_OVERWRITE = "overwrite"
+POLICY_VERSION = "version"
+OUTPUT_POLICIES = (POLICY_SKIP, POLICY_OVERWRITE, POLICY_VERSION)
+
+STATUS_SAVED = "saved"
+STATUS_SKIPPED = "skipped"
+
+FORMAT_PNG = "png"
+FORMAT_PNG_FAST = "png-fast"
+FORMAT_PNG_OPT = "png-opt"
+FORMAT_WEBP = "webp"
+
+# 출력 형식 -> (확장자, Pillow 형식, 저장 옵션)
+OUTPUT_FORMATS = {
+    FORMAT_PNG: (".png", "PNG", {}),
+    # 작업 중 반복 확인용: 압축을 거의 안 해서 빠르지만 파일이 크다
+    FORMAT_PNG_FAST: (".png", "PNG", {"compress_level": 1}),
+    # 배포용: 느리지만 가장 작은 PNG
+    FORMAT_PNG_OPT: (".png", "PNG", {"optimize": True}),
+    # exact: 알파가 0인 픽셀의 RGB도 그대로 둬서 PNG와 픽셀 단위로 같게 한다
+    FORMAT_WEBP: (".webp", "WEBP", {"lossless": True, "exact": True, "quality": 100, "method": 4}),
+}
+OUTPUT_EXTS = tuple(sorted({ext for ext, _, _ in OUTPUT_FORMATS.values()}))
+
+# 여러 프로세스가 같은 출력 폴더에 쓸 때 이름 고르기 + 쓰기를 이 파일 잠금으로 묶는다
+LOCK_NAME = ".ba_sprites.lock"
+
+
+def prefer_by_stem(paths: list[Path]) -> list[Path]:
+    # 형식을 바꿔 다시 저장해서 같은 이름이 .png/.webp 둘 다 있으면 OUTPUT_EXTS 순서(.png 먼저)로 하나만 남긴다
+    best: dict[str, Path] = {}
+    for p in paths:
+        cur = best.get(p.stem)
+        if cur is None or OUTPUT_EXTS.index(p.suffix.lower()) < OUTPUT_EXTS.index(cur.suffix.lower()):
+            best[p.stem] = p
+    return [p for p in paths if best[p.stem] is p]
+
+
+def check_format(fmt: str):
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"unknown output format: {fmt}")
+    if fmt == FORMAT_WEBP:
+        from PIL import features
+
+        if not features.check("webp"):
+            raise ValueError("이 Pillow 빌드는 WebP를 지원하지 않습니다.")
+
+
+def output_name(filename: str, fmt: str = FORMAT_PNG) -> str:
+    ext = OUTPUT_FORMATS[fmt][0]
+    return str(Path(filename).with_suffix(ext))
+
+
+def encode_image(img: Image.Image, fmt: str = FORMAT_PNG) -> bytes:
+    _, pil_format, options = OUTPUT_FORMATS[fmt]
+    with phase("encode"):
+        buf = io.BytesIO()
+        img.save(buf, format=pil_format, **options)
+        return buf.getvalue()
+
+
+def encode_png(img: Image.Image) -> bytes:
+    return encode_image(img, FORMAT_PNG)
+
+
+def _format_arg(raw: str) -> str:
+    try:
+        check_format(raw)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return raw
+
+
+def add_format_arg(ap: argparse.ArgumentParser):
+    ap.add_argument("--format", type=_format_arg, choices=list(OUTPUT_FORMATS), default=FORMAT_PNG,
+                    help="출력 형식 (png-fast: 빠른 확인용, png-opt: 배포용, webp: 무손실 WebP)")
+
+
+def tmp_path_for(path: Path) -> Path:
+    # 프로세스/스레드마다 다른 임시 이름. 점으로 시작해서 출력 목록에는 잡히지 않는다
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def atomic_write(path: Path, data: bytes):
+    # 다른 프로세스는 항상 완성된 파일만 본다 (중간에 죽어도 반쯤 쓴 출력이 남지 않음)
+    tmp = tmp_path_for(path)
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def _lock_file(f):
+    if os.name == "nt":
+        import msvcrt
+
+        while True:
+            try:
+                # LK_LOCK은 10초만 기다리고 포기하므로 될 때까지 다시 시도한다
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+    import fcntl
+
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+
+def _unlock_file(f):
+    if os.name == "nt":
+        import msvcrt
+
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        return
+    import fcntl
+
+    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _read_generation(f) -> int:
+    f.seek(0)
+    raw = f.read(32).strip()
+    return int(raw) if raw.isdigit() else 0
+
+
+class DirLock:
+    # 폴더 단위 권고(advisory) 잠금. 잠금 파일에는 이 폴더에 쓴 횟수(세대)를 적어서
+    # 다른 프로세스가 그 사이에 썼는지 안다 (폴더 mtime은 해상도가 거칠어 놓치는 경우가 있다)
+    # flock은 같은 프로세스의 스레드끼리는 막지 못해서 threading.Lock도 함께 잡는다
+    def __init__(self, folder: Path):
+        self.path = folder / LOCK_NAME
+        self.thread_lock = threading.Lock()
+        self.generation = 0
+        self._file = None
+
+    def peek(self) -> int:
+        # 잠금 없이 읽은 값은 오래됐을 수 있지만, 그러면 다음 쓰기에서 다시 확인할 뿐이다
+        try:
+            with open(self.path, "rb") as f:
+                return _read_generation(f)
+        except OSError:
+            return 0
+
+    def _open(self):
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        except FileNotFoundError:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        return os.fdopen(fd, "r+b")
+
+    @contextmanager
+    def hold(self):
+        # 잠금 파일은 쓰기 한 번 동안만 연다. 폴더마다 열어 두면 캐릭터/섹션 폴더가 많을 때 fd 한도를 넘는다
+        with self.thread_lock, self._open() as f:
+            _lock_file(f)
+            try:
+                self._file = f
+                self.generation = _read_generation(f)
+                yield self
+            finally:
+                self._file = None
+                f.seek(0)
+                _unlock_file(f)
+
+    def bump(self):
+        self.generation += 1
+        f = self._file
+        f.seek(0)
+        f.truncate()
+        f.write(str(self.generation).encode())
+        f.flush()
+
+
+class DirIndex:
+    def __init__(self, folder: Path):
+        self.folder = folder
+        self.sizes: dict[str, int] = {}
+        self.lock = DirLock(folder)
+        # synced: 폴더 전체가 self.sizes와 맞았던 세대, fresh: 이름별로 다시 확인한 세대
+        self.synced = -1
+        self.fresh: dict[str, int] = {}
+        self.scan()
+
+    def scan(self):
+        self.sizes.clear()
+        self.fresh.clear()
+        # 스캔 전에 읽어 두면 스캔 중에 다른 쓰기가 있어도 다음에 다시 확인하게 된다
+        self.synced = self.lock.peek()
+        if not self.folder.is_dir():
+            return
+        with phase("fs:scan"), os.scandir(self.folder) as it:
+            for e in it:
+                if e.is_file():
+                    self.sizes[e.name] = e.stat().st_size
+
+    def refresh(self, filename: str, generation: int):
+        # 다른 프로세스가 쓴 뒤라면 이 이름과 그 버전들만 다시 stat 한다 (폴더 전체를 다시 읽지 않음)
+        if generation in (self.synced, self.fresh.get(filename)):
+            return
+        base = Path(filename).stem
+        ext = Path(filename).suffix
+        name, i = filename, 0
+        with phase("fs:scan"):
+            while True:
+                try:
+                    self.sizes[name] = os.stat(self.folder / name).st_size
+                except OSError:
+                    if self.sizes.pop(name, None) is None and i > 0:
+                        break
+                i += 1
+                name = f"{base}_{i}{ext}"
+        self.fresh[filename] = generation
+
+    def _versions(self, filename: str) -> list[str]:
+        base = Path(filename).stem
+        ext = Path(filename).suffix
+        names = [filename] if filename in self.sizes else []
+        i = 1
+        while f"{base}_{i}{ext}" in self.sizes:
+            names.append(f"{base}_{i}{ext}")
+            i += 1
+        return names
+
+    def _same_content(self, name: str, data: bytes) -> bool:
+        if self.sizes.get(name) != len(data):
+            return False
+        try:
+            with phase("fs:read"):
+                return (self.folder / name).read_bytes() == data
+        except OSError:
+            return False
+
+    def resolve(self, filename: str, data: bytes, policy: str) -> Path | None:
+        if policy == POLICY_OVERWRITE:
+            return self.folder / filename
+        if policy == POLICY_SKIP:
+            return None if self._same_content(filename, data) else self.folder / filename
+        if policy == POLICY_VERSION:
+            versions = self._versions(filename)
+            if any(self._same_content(n, data) for n in versions):
+                return None
+            if filename not in self.sizes:
+                return self.folder / filename
+            base = Path(filename).stem
+            ext = Path(filename).suffix
+            i = 1
+            while f"{base}_{i}{ext}" in self.sizes:
+                i += 1
+            return self.folder / f"{base}_{i}{ext}"
+        raise ValueError(f"unknown output policy: {policy}")
+
+    def write(self, filename: str, data: bytes, policy: str) -> tuple[Path, str]:
+        # 이름 고르기와 쓰기를 한 잠금 안에서 해야 다른 프로세스와 같은 _N 버전을 고르지 않는다
+        with self.lock.hold() as lock:
+            self.refresh(filename, lock.generation)
+            out_path = self.resolve(filename, data, policy)
+            if out_path is None:
+                return self.folder / filename, STATUS_SKIPPED
+            with phase("fs:write"):
+                atomic_write(out_path, data)
+            self.sizes[out_path.name] = len(data)
+
+            # 자기 쓰기만 있었던 경우에는 계속 폴더 전체와 맞는 상태로 본다
+            synced = lock.generation == self.synced
+            lock.bump()
+            if synced:
+                self.synced = lock.generation
+            self.fresh[filename] = lock.generation
+        return out_path, STATUS_SAVED
+
+
+class OutputStore:
+    def __init__(self, policy: str = POLICY_SKIP):
+        if policy not in OUTPUT_POLICIES:
+            raise ValueError(f"unknown output policy: {policy}")
+        self.policy = policy
+        self.dirs: dict[Path, DirIndex] = {}
+        self.saved = 0
+        self.saved_bytes = 0
+
+    def index(self, folder: Path) -> DirIndex:
+        idx = self.dirs.get(folder)
+        if idx is None:
+            idx = DirIndex(folder)
+            self.dirs[folder] = idx
+        return idx
+
+    def write(self, folder: Path, filename: str, data: bytes) -> tuple[Path, str]:
+        out_path, status = self.index(folder).write(filename, data, self.policy)
+        if status == STATUS_SAVED:
+            self.saved += 1
+            self.saved_bytes += len(data)
+        return out_path, status
+
+    def summary(self) -> str:
+        return f"{self.saved} files, {self.saved_bytes / 1024 / 1024:.2f}MB written"
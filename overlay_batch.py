@@ -0,0 +1,152 @@
+import argparse
+import os
+from pathlib import Path
+
+from PIL import Image
+
+from mem_budget import MemoryBudget, add_memory_args, image_cost, report_peak_rss, submit_bounded
+from output_store import (
+    FORMAT_PNG,
+    OUTPUT_POLICIES,
+    POLICY_SKIP,
+    STATUS_SAVED,
+    OutputStore,
+    add_format_arg,
+    encode_image,
+    output_name,
+)
+from profiling import process_pool
+
+PNG_EXT = ".png"
+DEFAULT_OVERLAY_PATTERN = "{stem}.png"
+
+
+def composite_pair(base: Image.Image, overlay: Image.Image, offset: tuple[int, int] = (0, 0)) -> Image.Image:
+    if base.mode != "RGBA":
+        base = base.convert("RGBA")
+    if overlay.mode != "RGBA":
+        overlay = overlay.convert("RGBA")
+    merged = base.copy()
+
+    # 음수 오프셋은 오버레이의 잘려 나가는 부분을 source 쪽에서 건너뛴다
+    x, y = offset
+    sx, sy = max(0, -x), max(0, -y)
+    dx, dy = max(0, x), max(0, y)
+    if sx >= overlay.width or sy >= overlay.height or dx >= merged.width or dy >= merged.height:
+        return merged
+    merged.alpha_composite(overlay, dest=(dx, dy), source=(sx, sy))
+    return merged
+
+
+def center_offset(base_size: tuple[int, int], overlay_size: tuple[int, int]) -> tuple[int, int]:
+    return (base_size[0] - overlay_size[0]) // 2, (base_size[1] - overlay_size[1]) // 2
+
+
+def pair_files(base_dir: Path, overlay_dir: Path, pattern: str = DEFAULT_OVERLAY_PATTERN) -> list[tuple[Path, Path]]:
+    overlay_names = {p.name for p in overlay_dir.iterdir() if p.is_file()}
+    pairs = []
+    for base in sorted(base_dir.iterdir(), key=lambda p: p.name.lower()):
+        if not base.is_file() or base.suffix.lower() != PNG_EXT:
+            continue
+        name = pattern.format(stem=base.stem)
+        if overlay_dir == base_dir and name == base.name:
+            continue
+        if name in overlay_names:
+            pairs.append((base, overlay_dir / name))
+
+    # 같은 폴더 규칙(<stem>_overlay.png)에서는 오버레이 파일 자체를 베이스로 쓰지 않는다
+    if overlay_dir == base_dir:
+        overlays = {o for _, o in pairs}
+        pairs = [(b, o) for b, o in pairs if b not in overlays]
+    return pairs
+
+
+def render_pair(
+    base_path: Path, overlay_path: Path, offset: tuple[int, int] | None, center: bool, fmt: str = FORMAT_PNG
+) -> bytes:
+    with Image.open(base_path) as base, Image.open(overlay_path) as overlay:
+        if center:
+            offset = center_offset(base.size, overlay.size)
+        return encode_image(composite_pair(base, overlay, offset or (0, 0)), fmt)
+
+
+def batch_merge(
+    pairs: list[tuple[Path, Path]],
+    out_dir: Path,
+    offset: tuple[int, int] | None = None,
+    center: bool = False,
+    policy: str = POLICY_SKIP,
+    max_workers: int | None = None,
+    budget: MemoryBudget | None = None,
+    fmt: str = FORMAT_PNG,
+) -> tuple[int, int, int]:
+    from tqdm import tqdm
+
+    store = OutputStore(policy)
+    ok, skipped, fail = 0, 0, 0
+    if not pairs:
+        return ok, skipped, fail
+
+    if max_workers is None:
+        max_workers = min(len(pairs), os.cpu_count() or 1)
+    budget = budget or MemoryBudget()
+    with process_pool(max_workers) as ex, tqdm(total=len(pairs), desc="Merge") as bar:
+        tasks = ((b, image_cost(b) + image_cost(o), render_pair, (b, o, offset, center, fmt)) for b, o in pairs)
+        for base_path, fut in submit_bounded(ex, tasks, budget):
+            try:
+                _, status = store.write(out_dir, output_name(base_path.name, fmt), fut.result())
+                if status == STATUS_SAVED:
+                    ok += 1
+                else:
+                    skipped += 1
+            except Exception as e:
+                bar.write(f"[MERGE] {base_path.name} FAILED: {e}")
+                fail += 1
+            bar.update(1)
+    print(f"[MERGE] {fmt}: {store.summary()}")
+    return ok, skipped, fail
+
+
+def _parse_offset(raw: str) -> tuple[int, int]:
+    x, _, y = raw.partition(",")
+    try:
+        return int(x), int(y or 0)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid offset: {raw}")
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="베이스/오버레이 PNG를 규칙대로 짝지어 일괄 합성")
+    ap.add_argument("base_dir", type=Path)
+    ap.add_argument("overlay_dir", type=Path, nargs="?", help="생략하면 base_dir 안에서 --pattern으로 짝을 찾음")
+    ap.add_argument("--pattern", default=None,
+                    help="오버레이 파일 이름 규칙 (기본: 폴더 두 개면 {stem}.png, 하나면 {stem}_overlay.png)")
+    ap.add_argument("--out-dir", type=Path, default=Path("./merged"))
+    ap.add_argument("--offset", type=_parse_offset, default=None, help="X,Y (오버레이 왼쪽 위 위치)")
+    ap.add_argument("--center", action="store_true", help="크기가 다르면 오버레이를 가운데에 배치")
+    ap.add_argument("--policy", choices=OUTPUT_POLICIES, default=POLICY_SKIP)
+    ap.add_argument("--workers", type=int, default=None, help="0이면 현재 프로세스에서 실행")
+    add_format_arg(ap)
+    add_memory_args(ap)
+    return ap
+
+
+def main(argv: list[str] | None = None):
+    args = build_arg_parser().parse_args(argv)
+    overlay_dir = args.overlay_dir or args.base_dir
+    pattern = args.pattern or (DEFAULT_OVERLAY_PATTERN if args.overlay_dir else "{stem}_overlay.png")
+
+    pairs = pair_files(args.base_dir, overlay_dir, pattern)
+    print(f"[MERGE] {len(pairs)} pairs ({args.base_dir} + {overlay_dir}, pattern={pattern})")
+    budget = MemoryBudget(args.memory_mb)
+    ok, skipped, fail = batch_merge(
+        pairs, args.out_dir, offset=args.offset, center=args.center, policy=args.policy, max_workers=args.workers,
+        budget=budget,
+        fmt=args.format,
+    )
+    print(f"[MERGE] saved={ok} skipped={skipped} failed={fail} -> {args.out_dir}")
+    report_peak_rss("MERGE", budget)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+import argparse
+import io
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+import requests
+from PIL import Image
+
+from chat_compose import (
+    CHAT_IMG_SIZE,
+    CHAT_MARGIN,
+    CHAT_OUT_SIZE,
+    CHAT_SIDES,
+    ChatCanvas,
+    chat_variant_name,
+    prepare_face,
+    side_offset,
+)
+from crop_ops import (
+    CROP_PARAMS_PATH,
+    crop_region,
+    load_crop_params,
+    output_dirs_for,
+    resize_chain,
+    scan_png,
+    scan_sections,
+)
+from main import (
+    HEADERS,
+    collect_sprites_by_variant,
+    fetch_bytes,
+    filename_from_filetitle_or_url,
+    get_file_direct_url,
+    mw_api,
+    rate_limit,
+    safe_name,
+    should_download_by_filename,
+)
+from mem_budget import MEMORY_BUDGET_MB, MemoryBudget, add_memory_args, image_cost, report_peak_rss
+from output_store import (
+    FORMAT_PNG,
+    OUTPUT_FORMATS,
+    OUTPUT_POLICIES,
+    POLICY_SKIP,
+    STATUS_SAVED,
+    OutputStore,
+    add_format_arg,
+    atomic_write,
+    encode_image,
+    output_name,
+)
+from resample import TIER_FINAL, add_resample_arg
+
+PIPE_QUEUE_SIZE = 16
+PIPE_CROP_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+PIPE_CHAT_WORKERS = 1
+
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.ok = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+        self.max_queue = 0
+        self.lock = threading.Lock()
+
+    def add(self, ok: int = 0, skipped: int = 0, failed: int = 0, nbytes: int = 0, busy: float = 0.0):
+        with self.lock:
+            self.ok += ok
+            self.skipped += skipped
+            self.failed += failed
+            self.bytes += nbytes
+            self.busy += busy
+
+    def put(self, q: queue.Queue, item):
+        # 다음 단계 큐가 가득 차면 여기서 기다린다 (backpressure)
+        t0 = time.perf_counter()
+        q.put(item)
+        with self.lock:
+            self.blocked += time.perf_counter() - t0
+
+    def get(self, q: queue.Queue):
+        with self.lock:
+            self.max_queue = max(self.max_queue, q.qsize())
+        return q.get()
+
+    def summary(self, elapsed: float, queue_size: int | None) -> str:
+        rate = self.ok / elapsed if elapsed > 0 else 0.0
+        busy = self.busy / (elapsed * self.workers) * 100 if elapsed > 0 else 0.0
+        line = (
+            f"[PIPE] {self.name:<8} ok={self.ok} skipped={self.skipped} failed={self.failed} "
+            f"| {rate:.1f}/s {self.bytes / 1024 / 1024:.1f}MB | busy {busy:.0f}% x{self.workers} "
+            f"| blocked {self.blocked:.1f}s"
+        )
+        if queue_size is not None:
+            line += f" | in-queue max {self.max_queue}/{queue_size}"
+        return line
+
+
+def download_source(session: requests.Session, chars: list[str], images_root: Path, stats: StageStats):
+    for char in chars:
+        variants = collect_sprites_by_variant(session, char)
+        if not variants:
+            print(f"[PIPE] {char}: no sprites")
+            continue
+        char_name = safe_name(char)
+        for variant, files in variants.items():
+            if char.lower() not in (variant or "").lower():
+                continue
+            sec = safe_name(variant if variant else "Default")
+            for file_title in files:
+                if not should_download_by_filename(char, file_title):
+                    continue
+                t0 = time.perf_counter()
+                url = get_file_direct_url(session, file_title)
+                rate_limit()
+                if not url:
+                    stats.add(failed=1)
+                    continue
+
+                name = filename_from_filetitle_or_url(file_title, url)
+                out_path = images_root / char_name / sec / name
+                if out_path.exists() and out_path.stat().st_size > 0:
+                    data = out_path.read_bytes()
+                    stats.add(skipped=1, nbytes=len(data), busy=time.perf_counter() - t0)
+                    yield char_name, sec, name, data
+                    continue
+
+                data = fetch_bytes(session, url)
+                rate_limit()
+                if data is None:
+                    stats.add(failed=1)
+                    continue
+                out_path.parent.mkdir(parents=True, exist_ok=True)
+                atomic_write(out_path, data)
+                stats.add(ok=1, nbytes=len(data), busy=time.perf_counter() - t0)
+                yield char_name, sec, name, data
+
+
+def local_source(chars: list[str], images_root: Path, stats: StageStats):
+    # 이미 받은 images/에서 다시 흘려보낼 때 (네트워크 없이 crop/chat만)
+    for char in chars:
+        char_dir = images_root / safe_name(char)
+        for sec in scan_sections(char_dir):
+            for img_path in scan_png(char_dir / sec):
+                t0 = time.perf_counter()
+                data = img_path.read_bytes()
+                stats.add(ok=1, nbytes=len(data), busy=time.perf_counter() - t0)
+                yield char_dir.name, sec, img_path.name, data
+
+
+class Pipeline:
+    def __init__(
+        self,
+        emotion_root: Path,
+        chat_root: Path | None,
+        crop_params: dict[tuple[str, str], tuple[int, int, int, tuple[int, ...]]],
+        policy: str = POLICY_SKIP,
+        queue_size: int = PIPE_QUEUE_SIZE,
+        crop_workers: int = PIPE_CROP_WORKERS,
+        chat_workers: int = PIPE_CHAT_WORKERS,
+        img_size: tuple[int, int] = CHAT_IMG_SIZE,
+        out_size: tuple[int, int] = CHAT_OUT_SIZE,
+        margin: int = CHAT_MARGIN,
+        memory_mb: int = MEMORY_BUDGET_MB,
+        tier: str = TIER_FINAL,
+        fmt: str = FORMAT_PNG,
+    ):
+        if crop_workers < 1 or (chat_root and chat_workers < 1):
+            raise ValueError("crop/chat 워커는 1개 이상이어야 합니다 (큐를 비울 소비자가 없음).")
+        self.emotion_root = emotion_root
+        self.chat_root = chat_root
+        self.crop_params = crop_params
+        self.queue_size = queue_size
+        self.img_size = img_size
+        self.out_size = out_size
+        self.margin = margin
+        self.tier = tier
+        self.fmt = fmt
+
+        self.store = OutputStore(policy)
+        # 큐 크기는 개수만 막으므로, 디코딩 중인 원본의 크기는 따로 예산으로 막는다
+        self.budget = MemoryBudget(memory_mb)
+        self.store_lock = threading.Lock()
+        self.crop_q: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.chat_q: queue.Queue = queue.Queue(maxsize=queue_size)
+
+        self.source_stats = StageStats("download", 1)
+        self.crop_stats = StageStats("crop", crop_workers)
+        self.chat_stats = StageStats("chat", chat_workers if chat_root else 0)
+        self.no_params: set[tuple[str, str]] = set()
+
+    def _write(self, folder: Path, name: str, data: bytes) -> bool:
+        with self.store_lock:
+            _, status = self.store.write(folder, name, data)
+        return status == STATUS_SAVED
+
+    def _crop_worker(self):
+        stats = self.crop_stats
+        while True:
+            item = stats.get(self.crop_q)
+            if item is _DONE:
+                return
+            char, sec, name, data = item
+            t0 = time.perf_counter()
+            try:
+                x, y, cs, sizes = self.crop_params[(char, sec)]
+                buf = io.BytesIO(data)
+                with self.budget.reserve(image_cost(buf)):
+                    with Image.open(buf) as img, img.convert("RGBA") as rgba:
+                        crop = crop_region(rgba, x, y, cs)
+                    resized = resize_chain(crop, cs, list(sizes), self.tier)
+                    saved, nbytes = 0, 0
+                    out_name = output_name(name, self.fmt)
+                    for size, out_dir in output_dirs_for(self.emotion_root, char, list(sizes), cs).items():
+                        encoded = encode_image(resized[size], self.fmt)
+                        nbytes += len(encoded)
+                        saved += self._write(out_dir, out_name, encoded)
+                stats.add(ok=int(saved > 0), skipped=int(saved == 0), nbytes=nbytes, busy=time.perf_counter() - t0)
+            except Exception as e:
+                print(f"[PIPE] crop {char}/{sec}/{name} FAILED: {e}")
+                stats.add(failed=1, busy=time.perf_counter() - t0)
+                continue
+            if self.chat_root is not None:
+                stats.put(self.chat_q, (char, name, crop))
+
+    def _chat_worker(self):
+        stats = self.chat_stats
+        canvas = ChatCanvas(self.out_size)
+        while True:
+            item = stats.get(self.chat_q)
+            if item is _DONE:
+                return
+            char, name, crop = item
+            t0 = time.perf_counter()
+            try:
+                face = prepare_face(crop, self.img_size, self.tier)
+                stem = os.path.splitext(name)[0]
+                ext = OUTPUT_FORMATS[self.fmt][0]
+                saved, nbytes = 0, 0
+                for side in CHAT_SIDES:
+                    x = side_offset(side, face.width, self.out_size[0], self.margin)
+                    encoded = encode_image(canvas.place(face, x), self.fmt)
+                    nbytes += len(encoded)
+                    saved += self._write(self.chat_root / char, chat_variant_name(stem, side, ext), encoded)
+                stats.add(ok=int(saved > 0), skipped=int(saved == 0), nbytes=nbytes, busy=time.perf_counter() - t0)
+            except Exception as e:
+                print(f"[PIPE] chat {char}/{name} FAILED: {e}")
+                stats.add(failed=1, busy=time.perf_counter() - t0)
+
+    def run(self, source) -> float:
+        t_start = time.perf_counter()
+        crop_threads = [threading.Thread(target=self._crop_worker, daemon=True) for _ in range(self.crop_stats.workers)]
+        chat_threads = [threading.Thread(target=self._chat_worker, daemon=True) for _ in range(self.chat_stats.workers)]
+        for t in crop_threads + chat_threads:
+            t.start()
+
+        try:
+            for char, sec, name, data in source:
+                if (char, sec) not in self.crop_params:
+                    # 저장된 crop 위치가 없는 섹션은 다운로드만 한다
+                    self.no_params.add((char, sec))
+                    continue
+                self.source_stats.put(self.crop_q, (char, sec, name, data))
+        finally:
+            for _ in crop_threads:
+                self.crop_q.put(_DONE)
+            for t in crop_threads:
+                t.join()
+            for _ in chat_threads:
+                self.chat_q.put(_DONE)
+            for t in chat_threads:
+                t.join()
+        return time.perf_counter() - t_start
+
+    def report(self, elapsed: float):
+        print(f"[PIPE] elapsed {elapsed:.1f}s ({self.fmt})")
+        print(self.source_stats.summary(elapsed, None))
+        print(self.crop_stats.summary(elapsed, self.queue_size))
+        if self.chat_root is not None:
+            print(self.chat_stats.summary(elapsed, self.queue_size))
+        for char, sec in sorted(self.no_params):
+            print(f"[PIPE] (no crop params) {char}/{sec}")
+        report_peak_rss("PIPE", self.budget)
+
+
+def _positive_int(raw: str) -> int:
+    value = int(raw)
+    if value < 1:
+        # 워커가 없으면 앞 단계가 가득 찬 큐에서 영원히 기다린다
+        raise argparse.ArgumentTypeError("1 이상이어야 합니다.")
+    return value
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="다운로드 -> 얼굴 crop -> 채팅 이미지를 한 번에 처리")
+    ap.add_argument("chars", nargs="+", help="캐릭터 이름")
+    ap.add_argument("--local", action="store_true", help="다운로드 없이 images/에 있는 파일로 처리")
+    ap.add_argument("--images-root", type=Path, default=Path("./images"))
+    ap.add_argument("--emotion-root", type=Path, default=Path("./emotion"))
+    ap.add_argument("--chat-root", type=Path, default=Path("./chatimg"))
+    ap.add_argument("--no-chat", action="store_true", help="채팅 이미지 단계 생략")
+    ap.add_argument("--params", type=Path, default=CROP_PARAMS_PATH, help="face_cropper.py가 저장한 crop 위치")
+    ap.add_argument("--policy", choices=OUTPUT_POLICIES, default=POLICY_SKIP)
+    ap.add_argument("--queue", type=int, default=PIPE_QUEUE_SIZE, help="단계 사이 큐 크기")
+    ap.add_argument("--crop-workers", type=_positive_int, default=PIPE_CROP_WORKERS)
+    ap.add_argument("--chat-workers", type=_positive_int, default=PIPE_CHAT_WORKERS)
+    add_format_arg(ap)
+    add_resample_arg(ap)
+    add_memory_args(ap)
+    return ap
+
+
+def main(argv: list[str] | None = None):
+    args = build_arg_parser().parse_args(argv)
+    crop_params = load_crop_params(args.params)
+    if not crop_params:
+        print(f"[PIPE] crop 위치가 없습니다 ({args.params}) - face_cropper.py에서 먼저 섹션별 위치를 정하세요.")
+
+    pipe = Pipeline(
+        args.emotion_root,
+        None if args.no_chat else args.chat_root,
+        crop_params,
+        policy=args.policy,
+        queue_size=args.queue,
+        crop_workers=args.crop_workers,
+        chat_workers=args.chat_workers,
+        memory_mb=args.memory_mb,
+        tier=args.resample,
+        fmt=args.format,
+    )
+
+    if args.local:
+        pipe.source_stats.name = "read"
+        source = local_source(args.chars, args.images_root, pipe.source_stats)
+    else:
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        test = mw_api(session, {"action": "query", "meta": "siteinfo"})
+        if "query" not in test:
+            raise RuntimeError("MediaWiki API 응답이 예상과 다릅니다.")
+        source = download_source(session, args.chars, args.images_root, pipe.source_stats)
+
+    elapsed = pipe.run(source)
+    pipe.report(elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import argparse
+import cProfile
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+
+PROFILE_TOP_N = 15
+
+_ACTIVE: "PhaseProfiler | None" = None
+
+
+class PhaseStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.peak = 0
+        self.net = 0
+        self.profile = cProfile.Profile()
+        self.alloc_top: list[str] = []
+
+
+class _Frame:
+    def __init__(self, stats: PhaseStats, mem_start: int, snapshot):
+        self.stats = stats
+        self.t0 = time.perf_counter()
+        self.child_seconds = 0.0
+        self.mem_start = mem_start
+        self.peak = 0
+        self.snapshot = snapshot
+
+
+class PhaseProfiler:
+    # 한 스레드 전용: 단계 스택 하나와 cProfile 하나를 번갈아 켜므로, 다른 스레드의 phase()는 측정하지 않는다
+    # (Python 3.12부터는 cProfile 두 개를 동시에 켜면 ValueError)
+    def __init__(self, out_path: Path, top_n: int = PROFILE_TOP_N):
+        self.out_path = out_path
+        self.top_n = top_n
+        self.phases: dict[str, PhaseStats] = {}
+        self.stack: list[_Frame] = []
+        self.t_start = 0.0
+        self.overhead = 0.0
+        self.thread = threading.get_ident()
+
+    def start(self):
+        self.thread = threading.get_ident()
+        tracemalloc.start()
+        self.t_start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        # cProfile은 동시에 하나만 켤 수 있어서, 안쪽 단계에 들어가면 바깥 단계는 잠시 멈춘다 (시간은 단계별 순수 시간)
+        cur, peak = tracemalloc.get_traced_memory()
+        if self.stack:
+            outer = self.stack[-1]
+            outer.stats.profile.disable()
+            outer.peak = max(outer.peak, peak)
+        tracemalloc.reset_peak()
+
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = PhaseStats(name)
+        # 할당 위치 비교는 각 단계의 첫 호출에서만 (스냅샷이 무겁다). 스냅샷 시간은 어느 단계에도 넣지 않는다
+        t_snap = time.perf_counter()
+        snapshot = tracemalloc.take_snapshot() if stats.calls == 0 else None
+        overhead = time.perf_counter() - t_snap
+        frame = _Frame(stats, cur, snapshot)
+        self.stack.append(frame)
+        stats.profile.enable()
+        try:
+            yield
+        finally:
+            stats.profile.disable()
+            self.stack.pop()
+            elapsed = time.perf_counter() - frame.t0
+            end_cur, end_peak = tracemalloc.get_traced_memory()
+            stats.calls += 1
+            stats.seconds += elapsed - frame.child_seconds
+            stats.peak = max(stats.peak, frame.peak, end_peak)
+            stats.net += end_cur - frame.mem_start
+            if frame.snapshot is not None:
+                t_snap = time.perf_counter()
+                diff = tracemalloc.take_snapshot().compare_to(frame.snapshot, "lineno")
+                stats.alloc_top = [str(d) for d in diff[:5]]
+                overhead += time.perf_counter() - t_snap
+            self.overhead += overhead
+
+            if self.stack:
+                outer = self.stack[-1]
+                outer.child_seconds += elapsed + overhead
+                outer.peak = max(outer.peak, stats.peak)
+                tracemalloc.reset_peak()
+                outer.stats.profile.enable()
+
+    def report(self) -> str:
+        total = time.perf_counter() - self.t_start
+        mb = 1024 * 1024
+        lines = [f"[PROFILE] total {total:.2f}s", f"[PROFILE] {'phase':<20}{'calls':>8}{'time(s)':>10}{'share':>8}{'peak MB':>10}{'net MB':>9}"]
+        phases = sorted(self.phases.values(), key=lambda p: p.seconds, reverse=True)
+        for p in phases:
+            share = p.seconds / total * 100 if total > 0 else 0.0
+            lines.append(
+                f"[PROFILE] {p.name:<20}{p.calls:>8}{p.seconds:>10.3f}{share:>7.0f}%{p.peak / mb:>10.1f}{p.net / mb:>9.1f}"
+            )
+        lines.append(f"[PROFILE] {'(snapshots)':<20}{'':>8}{self.overhead:>10.3f}")
+
+        for p in phases:
+            buf = io.StringIO()
+            pstats.Stats(p.profile, stream=buf).sort_stats("cumulative").print_stats(self.top_n)
+            lines.append("")
+            lines.append(f"===== {p.name} ({p.seconds:.3f}s, peak {p.peak / mb:.1f}MB) =====")
+            body = buf.getvalue()
+            lines.extend(body[body.find("   ncalls"):].rstrip().splitlines() if "   ncalls" in body else [])
+            if p.alloc_top:
+                lines.append("  -- allocations (first call) --")
+                lines.extend(f"  {a}" for a in p.alloc_top)
+        return "\n".join(lines)
+
+    def finish(self):
+        tracemalloc.stop()
+        combined = None
+        for p in self.phases.values():
+            if combined is None:
+                combined = pstats.Stats(p.profile)
+            else:
+                combined.add(p.profile)
+        if combined is not None:
+            combined.dump_stats(str(self.out_path))
+
+        text = self.report()
+        summary_path = self.out_path.with_suffix(".txt")
+        summary_path.write_text(text + "\n", encoding="utf-8")
+        for line in text.splitlines():
+            if line.startswith("[PROFILE]"):
+                print(line)
+        print(f"[PROFILE] {self.out_path} (snakeviz/pstats), summary -> {summary_path}")
+
+
+@contextmanager
+def phase(name: str):
+    if _ACTIVE is None or _ACTIVE.thread != threading.get_ident():
+        yield
+        return
+    with _ACTIVE.phase(name):
+        yield
+
+
+@contextmanager
+def profile_run(out_path: Path | None, top_n: int = PROFILE_TOP_N, name: str = "main"):
+    global _ACTIVE
+    if out_path is None:
+        yield
+        return
+    _ACTIVE = PhaseProfiler(out_path, top_n)
+    _ACTIVE.start()
+    try:
+        with _ACTIVE.phase(name):
+            yield
+    finally:
+        profiler, _ACTIVE = _ACTIVE, None
+        profiler.finish()
+
+
+def check_profile_workers(ap: argparse.ArgumentParser, args: argparse.Namespace):
+    # --profile은 현재 프로세스의 한 스레드만 측정하므로 작업을 인라인(workers=0)으로 돌린다
+    if not args.profile:
+        return
+    if args.workers:
+        ap.error("--profile은 현재 프로세스에서만 측정합니다. --workers를 빼거나 0으로 주세요.")
+    args.workers = 0
+
+
+def add_profile_args(ap: argparse.ArgumentParser, default_path: str):
+    ap.add_argument("--profile", nargs="?", type=Path, const=Path(default_path), default=None,
+                    help=f"단계별 cProfile/tracemalloc 결과 저장 (기본: {default_path})")
+    ap.add_argument("--profile-top", type=int, default=PROFILE_TOP_N, help="단계별로 출력할 함수 수")
+
+
+class InlineExecutor:
+    # --profile에서 워커 프로세스 대신 현재 프로세스에서 실행해 디코딩/인코딩까지 보이게 한다
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        fut = Future()
+        try:
+            fut.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            fut.set_exception(e)
+        return fut
+
+    def map(self, fn, *iterables, chunksize: int = 1):
+        return map(fn, *iterables)
+
+
+def process_pool(max_workers: int | None):
+    if max_workers == 0:
+        return InlineExecutor()
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(max_workers=max_workers)
@@ -0,0 +1,118 @@
+import argparse
+import math
+import time
+from pathlib import Path
+
+from PIL import Image, ImageChops
+
+TIER_DRAFT = "draft"
+TIER_PREVIEW = "preview"
+TIER_FINAL = "final"
+
+# 티어 -> (마지막 필터, 정수 축소 후 남겨둘 최소 배율)
+# 배율이 클수록 마지막 필터가 보는 픽셀이 많아 원래 LANCZOS 결과에 가깝다
+RESAMPLE_TIERS = {
+    TIER_DRAFT: (Image.Resampling.BILINEAR, 1.0),
+    TIER_PREVIEW: (Image.Resampling.BICUBIC, 2.0),
+    TIER_FINAL: (Image.Resampling.LANCZOS, 3.0),
+}
+
+# 알파가 있는 모드는 미리 곱한(premultiplied) 모드로 한 번만 바꿔서 축소/필터를 모두 거친다
+_PREMULTIPLIED = {"RGBA": "RGBa", "LA": "La"}
+
+
+def reduce_factor(src: int, dst: int, gap: float) -> int:
+    return max(1, int(src / (dst * gap)))
+
+
+def resize_image(img: Image.Image, size: tuple[int, int], tier: str = TIER_FINAL) -> Image.Image:
+    if img.size == size:
+        return img
+    resample, gap = RESAMPLE_TIERS[tier]
+    fx = reduce_factor(img.width, size[0], gap)
+    fy = reduce_factor(img.height, size[1], gap)
+
+    mode = img.mode
+    work = img.convert(_PREMULTIPLIED[mode]) if mode in _PREMULTIPLIED else img
+    if fx > 1 or fy > 1:
+        # 정수 배 박스 평균으로 먼저 줄이면 마지막 필터가 훨씬 적은 픽셀만 본다
+        work = work.reduce((fx, fy))
+    work = work.resize(size, resample)
+    return work.convert(mode) if mode in _PREMULTIPLIED else work
+
+
+def _visible(img: Image.Image) -> Image.Image:
+    # 거의 투명한 픽셀의 색 차이는 보이지 않으므로 알파를 곱한 값으로 비교한다
+    if img.mode not in _PREMULTIPLIED:
+        return img
+    return Image.frombytes(img.mode, img.size, img.convert(_PREMULTIPLIED[img.mode]).tobytes())
+
+
+def psnr(a: Image.Image, b: Image.Image) -> float:
+    # 모든 밴드(알파 포함)의 평균 제곱 오차로 계산한 PSNR (dB)
+    hist = ImageChops.difference(_visible(a), _visible(b)).histogram()
+    bands = len(hist) // 256
+    sq = sum(count * (i % 256) ** 2 for i, count in enumerate(hist))
+    mse = sq / (a.width * a.height * bands)
+    if mse == 0:
+        return math.inf
+    return 10 * math.log10(255 * 255 / mse)
+
+
+def compare_tiers(images: list[Image.Image], size: tuple[int, int], repeat: int = 3) -> dict[str, tuple[float, float]]:
+    # 티어별 (이미지당 최소 시간, 단일 LANCZOS 대비 최저 PSNR)
+    def timed(fn) -> tuple[float, list[Image.Image]]:
+        best, out = math.inf, []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            out = [fn(img) for img in images]
+            best = min(best, time.perf_counter() - t0)
+        return best / len(images), out
+
+    base_t, base = timed(lambda img: img.resize(size, Image.Resampling.LANCZOS))
+    results = {"lanczos": (base_t, math.inf)}  # 기준
+    for tier in RESAMPLE_TIERS:
+        t, out = timed(lambda img: resize_image(img, size, tier))
+        results[tier] = (t, min(psnr(o, r) for o, r in zip(out, base)))
+    return results
+
+
+def add_resample_arg(ap: argparse.ArgumentParser, default: str = TIER_FINAL):
+    ap.add_argument("--resample", choices=list(RESAMPLE_TIERS), default=default,
+                    help="축소 품질 (draft: 가장 빠름, final: 단일 LANCZOS와 거의 같음)")
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="리샘플링 티어별 속도와 화질(PSNR, 단일 LANCZOS 기준) 비교")
+    ap.add_argument("images", type=Path, nargs="*", help="비교할 PNG (생략하면 벤치마크용 합성 스프라이트)")
+    ap.add_argument("--size", type=int, nargs="+", default=[512, 200, 64], help="출력 한 변 크기")
+    ap.add_argument("--repeat", type=int, default=3)
+    return ap
+
+
+def main(argv: list[str] | None = None):
+    from crop_ops import open_rgba
+
+    args = build_arg_parser().parse_args(argv)
+    paths = args.images
+    if not paths:
+        from bench import BENCH_DIR, sprite_fixtures
+
+        paths = sprite_fixtures(BENCH_DIR, 3)
+    images = [open_rgba(p) for p in paths]
+    w, h = images[0].size
+    print(f"[RESAMPLE] {len(images)} images, first {w}x{h}")
+
+    for side in args.size:
+        # 가로세로 비율은 첫 이미지 기준
+        size = (side, max(1, round(side * h / w)))
+        results = compare_tiers(images, size, args.repeat)
+        base_t = results["lanczos"][0]
+        for name, (t, db) in results.items():
+            speed = base_t / t if t > 0 else 0.0
+            quality = "identical" if math.isinf(db) else f"{db:.1f}dB"
+            print(f"[RESAMPLE] {size[0]}x{size[1]} {name:<8} {t * 1000:8.1f}ms/img  x{speed:4.1f}  PSNR {quality}")
+
+
+if __name__ == "__main__":
+    main()
@@ -111,7 +111,11 @@ class KeyMapper:
             self.tree.bind("<<TreeviewSelect>>", self.on_select)
 
 
-if __name__ == "__main__":
+def main():
     root = tk.Tk()
     KeyMapper(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
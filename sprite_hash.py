@@ -0,0 +1,256 @@
+import argparse
+import hashlib
+import io
+import json
+import math
+import os
+from pathlib import Path
+
+from PIL import Image
+
+from fs_watch import scan_tree
+from output_store import OUTPUT_EXTS, prefer_by_stem
+from profiling import process_pool
+
+HASH_INDEX_NAME = ".sprite_hashes.json"
+HASH_NEAR_DISTANCE = 6
+
+DHASH_SIZE = (9, 8)
+PHASH_SIDE = 32
+PHASH_LOW = 8
+
+# pHash용 DCT 계수표 (저주파 8개만 필요)
+_DCT_COS = [
+    [math.cos((2 * x + 1) * u * math.pi / (2 * PHASH_SIDE)) for x in range(PHASH_SIDE)]
+    for u in range(PHASH_LOW)
+]
+
+
+def _hash_gray(img: Image.Image) -> Image.Image:
+    # 투명 배경은 흰색으로 깔아서 같은 그림이면 같은 밝기가 되게 한다
+    if img.mode != "RGBA":
+        img = img.convert("RGBA")
+    bg = Image.new("RGBA", img.size, (255, 255, 255, 255))
+    bg.alpha_composite(img)
+    return bg.convert("L")
+
+
+def _bits_to_int(bits) -> int:
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def dhash(gray: Image.Image) -> int:
+    w, h = DHASH_SIZE
+    px = list(gray.resize(DHASH_SIZE, Image.Resampling.BOX).getdata())
+    return _bits_to_int(px[y * w + x] > px[y * w + x + 1] for y in range(h) for x in range(w - 1))
+
+
+def phash(gray: Image.Image) -> int:
+    n = PHASH_SIDE
+    px = list(gray.resize((n, n), Image.Resampling.BOX).getdata())
+    rows = [px[y * n:(y + 1) * n] for y in range(n)]
+    # 행 방향 DCT 후 열 방향 DCT, 저주파 8x8만 계산한다
+    tmp = [[sum(c * p for c, p in zip(cos_u, row)) for cos_u in _DCT_COS] for row in rows]
+    coefs = [
+        sum(cos_v[y] * tmp[y][u] for y in range(n))
+        for cos_v in _DCT_COS
+        for u in range(PHASH_LOW)
+    ]
+    median = sorted(coefs[1:])[len(coefs) // 2 - 1]
+    return _bits_to_int(c > median for c in coefs)
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def hash_file(path: Path) -> dict:
+    data = path.read_bytes()
+    with Image.open(io.BytesIO(data)) as img:
+        gray = _hash_gray(img)
+    return {
+        "sha1": hashlib.sha1(data).hexdigest(),
+        "dhash": f"{dhash(gray):016x}",
+        "phash": f"{phash(gray):016x}",
+    }
+
+
+def scan_sprites(root: Path) -> dict[str, tuple[int, int]]:
+    # crop을 WebP로 저장한 폴더도 해시한다. 같은 폴더에 같은 이름의 .png/.webp가 있으면
+    # chat_compose.generate_all과 같은 규칙(prefer_by_stem)으로 실제로 쓰이는 파일 하나만 남긴다
+    found = scan_tree(root, OUTPUT_EXTS)
+    by_dir: dict[Path, list[Path]] = {}
+    for rel in found:
+        p = Path(rel)
+        by_dir.setdefault(p.parent, []).append(p)
+    keep = {p.as_posix() for paths in by_dir.values() for p in prefer_by_stem(paths)}
+    return {rel: meta for rel, meta in found.items() if rel in keep}
+
+
+def _hash_job(path: Path, mtime: int, size: int) -> tuple[Path, dict]:
+    entry = hash_file(path)
+    entry["mtime"] = mtime
+    entry["size"] = size
+    return path, entry
+
+
+class HashIndex:
+    def __init__(self, root: Path, index_path: Path | None = None):
+        self.root = root
+        self.index_path = index_path or root / HASH_INDEX_NAME
+        # root 기준 상대 경로 -> {sha1, dhash, phash, mtime, size}
+        self.entries: dict[str, dict] = {}
+        if self.index_path.is_file():
+            try:
+                self.entries = json.loads(self.index_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def exists(self) -> bool:
+        return self.index_path.is_file()
+
+    def refresh(self, max_workers: int | None = None) -> tuple[int, int]:
+        found = scan_sprites(self.root)
+        removed = [rel for rel in self.entries if rel not in found]
+        for rel in removed:
+            del self.entries[rel]
+
+        # mtime/크기가 그대로인 파일은 다시 해시하지 않는다
+        todo = []
+        for rel, (mtime, size) in found.items():
+            old = self.entries.get(rel)
+            if old is None or old["mtime"] != mtime or old["size"] != size:
+                todo.append((rel, mtime, size))
+
+        if todo:
+            if max_workers is None:
+                max_workers = min(len(todo), os.cpu_count() or 1)
+            with process_pool(max_workers) as ex:
+                results = ex.map(
+                    _hash_job,
+                    [self.root / rel for rel, _, _ in todo],
+                    [m for _, m, _ in todo],
+                    [s for _, _, s in todo],
+                    chunksize=16,
+                )
+                for (rel, _, _), (_, entry) in zip(todo, results):
+                    self.entries[rel] = entry
+
+        if todo or removed or not self.exists():
+            self.save()
+        return len(todo), len(removed)
+
+    def save(self):
+        tmp = self.index_path.with_name(self.index_path.name + ".tmp")
+        tmp.write_text(json.dumps(self.entries, ensure_ascii=False, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.index_path)
+
+    def path(self, rel: str) -> Path:
+        return self.root / rel
+
+    def exact_groups(self) -> list[list[Path]]:
+        by_sha: dict[str, list[str]] = {}
+        for rel, entry in self.entries.items():
+            by_sha.setdefault(entry["sha1"], []).append(rel)
+        groups = [sorted(rels, key=str.lower) for rels in by_sha.values() if len(rels) > 1]
+        groups.sort(key=lambda g: g[0].lower())
+        return [[self.path(rel) for rel in g] for g in groups]
+
+    def near_pairs(self, max_distance: int = HASH_NEAR_DISTANCE) -> list[tuple[Path, Path, int, int]]:
+        # 64비트를 (거리+1)개 구간으로 나누면 거리 이하인 쌍은 적어도 한 구간이 완전히 같다
+        bands = max_distance + 1
+        bounds = [(64 * i // bands, 64 * (i + 1) // bands) for i in range(bands)]
+
+        # 완전히 같은 파일은 대표 하나만 비교한다
+        reps: dict[str, str] = {}
+        for rel in sorted(self.entries, key=str.lower):
+            reps.setdefault(self.entries[rel]["sha1"], rel)
+        rels = list(reps.values())
+        dh = [int(self.entries[rel]["dhash"], 16) for rel in rels]
+        ph = [int(self.entries[rel]["phash"], 16) for rel in rels]
+
+        buckets: dict[tuple[int, int], list[int]] = {}
+        for i, h in enumerate(dh):
+            for b, (lo, hi) in enumerate(bounds):
+                key = (b, (h >> lo) & ((1 << (hi - lo)) - 1))
+                buckets.setdefault(key, []).append(i)
+
+        seen: set[tuple[int, int]] = set()
+        pairs = []
+        for members in buckets.values():
+            for a_pos, a in enumerate(members):
+                for b in members[a_pos + 1:]:
+                    if (a, b) in seen:
+                        continue
+                    seen.add((a, b))
+                    dd = hamming(dh[a], dh[b])
+                    pd = hamming(ph[a], ph[b])
+                    if dd <= max_distance and pd <= max_distance * 2:
+                        pairs.append((self.path(rels[a]), self.path(rels[b]), dd, pd))
+        pairs.sort(key=lambda p: (p[2] + p[3], str(p[0]).lower()))
+        return pairs
+
+    def canonical_map(self) -> dict[Path, Path]:
+        out: dict[Path, Path] = {}
+        for group in self.exact_groups():
+            for p in group[1:]:
+                out[p] = group[0]
+        return out
+
+
+def load_duplicates(root: Path, max_workers: int | None = None) -> dict[Path, Path]:
+    # 인덱스를 한 번이라도 만든 폴더만 갱신해서 쓴다 (처음 전체 해시는 CLI로)
+    index = HashIndex(root)
+    if not index.exists():
+        return {}
+    index.refresh(max_workers)
+    return index.canonical_map()
+
+
+def build_report(index: HashIndex, max_distance: int) -> dict:
+    return {
+        "root": str(index.root),
+        "files": len(index.entries),
+        "exact": [[str(p) for p in g] for g in index.exact_groups()],
+        "near": [
+            {"a": str(a), "b": str(b), "dhash": dd, "phash": pd}
+            for a, b, dd, pd in index.near_pairs(max_distance)
+        ],
+    }
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="퍼셉추얼 해시로 중복/유사 스프라이트 찾기")
+    ap.add_argument("root", type=Path, nargs="?", default=Path("./images"))
+    ap.add_argument("--index", type=Path, default=None, help=f"해시 인덱스 파일 (기본: <root>/{HASH_INDEX_NAME})")
+    ap.add_argument("--distance", type=int, default=HASH_NEAR_DISTANCE, help="유사 판정 dHash 해밍 거리")
+    ap.add_argument("--json", type=Path, default=None, help="결과를 JSON으로 저장")
+    ap.add_argument("--workers", type=int, default=None, help="0이면 현재 프로세스에서 실행")
+    return ap
+
+
+def main(argv: list[str] | None = None):
+    args = build_arg_parser().parse_args(argv)
+    if not args.root.is_dir():
+        raise SystemExit(f"폴더를 찾지 못했습니다: {args.root.resolve()}")
+
+    index = HashIndex(args.root, args.index)
+    hashed, removed = index.refresh(args.workers)
+    print(f"[HASH] {len(index.entries)} files (hashed={hashed}, removed={removed}) -> {index.index_path}")
+
+    report = build_report(index, args.distance)
+    for group in report["exact"]:
+        print(f"[HASH] exact: {' = '.join(group)}")
+    for pair in report["near"]:
+        print(f"[HASH] near: {pair['a']} ~ {pair['b']} (dhash={pair['dhash']}, phash={pair['phash']})")
+    print(f"[HASH] exact groups={len(report['exact'])} near pairs={len(report['near'])}")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, ensure_ascii=False, indent=1), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import argparse
+import io
+import json
+import os
+import shutil
+from pathlib import Path
+
+from PIL import Image, ImageChops
+
+from crop_ops import open_rgba, scan_png, scan_sections
+from profiling import process_pool
+
+LAYER_INDEX = "index.json"
+LAYER_BASE = "base.png"
+LAYER_PATCH_DIR = "patches"
+# 베이스를 고를 때 비교하는 축소 배율 (정수 박스 축소)
+BASE_PICK_REDUCE = 8
+
+_BASES: dict[Path, Image.Image] = {}
+
+
+def _base_image(base_path: Path) -> Image.Image:
+    img = _BASES.get(base_path)
+    if img is None:
+        _BASES.clear()
+        img = open_rgba(base_path)
+        _BASES[base_path] = img
+    return img
+
+
+def diff_bbox(base: Image.Image, img: Image.Image) -> tuple[int, int, int, int] | None:
+    if base.size != img.size:
+        return 0, 0, img.width, img.height
+    return ImageChops.difference(base, img).getbbox(alpha_only=False)
+
+
+def _small_file(img_path: Path) -> Image.Image:
+    with open_rgba(img_path) as img:
+        return img.reduce(BASE_PICK_REDUCE)
+
+
+def pick_base(smalls: list[Image.Image]) -> int:
+    # 다른 스프라이트들과의 차이 bbox 넓이 합이 가장 작은 것 (medoid). 표정이 특이한 첫 파일을 베이스로 잡으면
+    # 나머지 패치가 모두 그 표정 영역만큼 커지므로, 섹션에서 가장 "보통"인 스프라이트를 고른다
+    def area(bbox: tuple[int, int, int, int] | None) -> int:
+        return 0 if bbox is None else (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+
+    n = len(smalls)
+    costs = [0] * n
+    for i in range(n):
+        for j in range(i + 1, n):
+            a = area(diff_bbox(smalls[i], smalls[j]))
+            costs[i] += a
+            costs[j] += a
+    return min(range(n), key=costs.__getitem__)
+
+
+def _diff_file(base_path: Path, img_path: Path) -> tuple[str, tuple[int, int, int, int] | None, tuple[int, int], bytes | None]:
+    img = open_rgba(img_path)
+    bbox = diff_bbox(_base_image(base_path), img)
+    patch = None
+    if bbox is not None:
+        buf = io.BytesIO()
+        img.crop(bbox).save(buf, format="PNG")
+        patch = buf.getvalue()
+    return img_path.name, bbox, img.size, patch
+
+
+def pack_section(section_dir: Path, out_dir: Path, max_workers: int | None = None) -> dict:
+    pngs = scan_png(section_dir)
+    if not pngs:
+        return {}
+
+    # 새 폴더에 모두 쓴 뒤 바꿔 넣어서, 없어졌거나 이제 베이스와 같은 스프라이트의 예전 패치가 남지 않게 한다
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    (tmp_dir / LAYER_PATCH_DIR).mkdir(parents=True)
+
+    items = {}
+    with process_pool(max_workers) as ex:
+        base_path = pngs[pick_base(list(ex.map(_small_file, pngs)))] if len(pngs) > 2 else pngs[0]
+        base = open_rgba(base_path)
+        base.save(tmp_dir / LAYER_BASE, format="PNG")
+
+        results = ex.map(_diff_file, [base_path] * len(pngs), pngs)
+        for name, bbox, size, patch in results:
+            item = {"bbox": list(bbox) if bbox else None, "size": list(size), "patch": None}
+            if patch is not None:
+                rel = f"{LAYER_PATCH_DIR}/{Path(name).stem}.png"
+                (tmp_dir / rel).write_bytes(patch)
+                item["patch"] = rel
+            items[name] = item
+
+    index = {
+        "source": str(section_dir),
+        "base": LAYER_BASE,
+        "base_source": base_path.name,
+        "size": list(base.size),
+        "items": items,
+    }
+    (tmp_dir / LAYER_INDEX).write_text(json.dumps(index, ensure_ascii=False, indent=1), encoding="utf-8")
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return index
+
+
+class LayeredSection:
+    def __init__(self, layer_dir: Path):
+        self.layer_dir = layer_dir
+        self.index = json.loads((layer_dir / LAYER_INDEX).read_text(encoding="utf-8"))
+        self.items: dict[str, dict] = self.index["items"]
+        self._base: Image.Image | None = None
+
+    @property
+    def base(self) -> Image.Image:
+        if self._base is None:
+            self._base = open_rgba(self.layer_dir / self.index["base"])
+        return self._base
+
+    def names(self) -> list[str]:
+        return sorted(self.items, key=str.lower)
+
+    def _patch(self, item: dict) -> Image.Image:
+        return open_rgba(self.layer_dir / item["patch"])
+
+    def reconstruct(self, name: str) -> Image.Image:
+        item = self.items[name]
+        if item["patch"] is None:
+            return self.base.copy()
+        if list(self.base.size) != item["size"]:
+            return self._patch(item)
+        img = self.base.copy()
+        img.paste(self._patch(item), tuple(item["bbox"][:2]))
+        return img
+
+    def crop(self, name: str, box: tuple[int, int, int, int]) -> Image.Image:
+        # 얼굴 영역만 필요할 때는 전체를 복원하지 않고 겹치는 패치만 붙인다
+        item = self.items[name]
+        if item["patch"] is not None and list(self.base.size) != item["size"]:
+            return self._patch(item).crop(box)
+        out = self.base.crop(box)
+        if item["patch"] is None:
+            return out
+        l, t, r, b = item["bbox"]
+        il, it, ir, ib = max(l, box[0]), max(t, box[1]), min(r, box[2]), min(b, box[3])
+        if il >= ir or it >= ib:
+            return out
+        patch = self._patch(item).crop((il - l, it - t, ir - l, ib - t))
+        out.paste(patch, (il - box[0], it - box[1]))
+        return out
+
+
+def _dir_bytes(folder: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(folder):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+def verify_section(section_dir: Path, layer_dir: Path) -> int:
+    layers = LayeredSection(layer_dir)
+    bad = 0
+    for name in layers.names():
+        if ImageChops.difference(open_rgba(section_dir / name), layers.reconstruct(name)).getbbox(alpha_only=False):
+            print(f"[LAYERS] mismatch: {section_dir / name}")
+            bad += 1
+    return bad
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="섹션별 공통 베이스 + 표정 패치로 스프라이트를 저장")
+    ap.add_argument("char_dirs", type=Path, nargs="+", help="images/<캐릭터> 폴더")
+    ap.add_argument("--out-root", type=Path, default=Path("./layers"))
+    ap.add_argument("--verify", action="store_true", help="저장 후 원본과 픽셀 단위로 비교")
+    ap.add_argument("--workers", type=int, default=None, help="0이면 현재 프로세스에서 실행")
+    return ap
+
+
+def main(argv: list[str] | None = None):
+    args = build_arg_parser().parse_args(argv)
+    for char_dir in args.char_dirs:
+        for sec in scan_sections(char_dir):
+            section_dir = char_dir / sec
+            layer_dir = args.out_root / char_dir.name / sec
+            index = pack_section(section_dir, layer_dir, args.workers)
+            if not index:
+                continue
+            src_bytes = sum(p.stat().st_size for p in scan_png(section_dir))
+            dst_bytes = _dir_bytes(layer_dir)
+            print(
+                f"[LAYERS] {char_dir.name}/{sec}: {len(index['items'])} sprites, "
+                f"{src_bytes / 1024:.0f}KB -> {dst_bytes / 1024:.0f}KB"
+            )
+            if args.verify:
+                bad = verify_section(section_dir, layer_dir)
+                print(f"[LAYERS] {char_dir.name}/{sec}: verify {'OK' if not bad else f'{bad} mismatches'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import argparse
+import hashlib
+import io
+import os
+import sqlite3
+from pathlib import Path
+
+from PIL import Image
+
+from fs_watch import scan_tree
+from profiling import process_pool
+
+META_DB_NAME = ".sprite_meta.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sprites (
+    path TEXT PRIMARY KEY,
+    mtime INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    mode TEXT NOT NULL,
+    bbox_l INTEGER,
+    bbox_t INTEGER,
+    bbox_r INTEGER,
+    bbox_b INTEGER,
+    sha1 TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sprites_sha1 ON sprites (sha1);
+"""
+
+_COLUMNS = "path, mtime, size, width, height, mode, bbox_l, bbox_t, bbox_r, bbox_b, sha1"
+
+
+class SpriteInfo:
+    def __init__(self, row: tuple):
+        self.path, self.mtime, self.file_size, self.width, self.height, self.mode = row[:6]
+        bbox = row[6:10]
+        # 완전히 투명한 이미지는 bbox가 없다
+        self.alpha_bbox: tuple[int, int, int, int] | None = None if bbox[0] is None else tuple(bbox)
+        self.sha1 = row[10]
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return self.width, self.height
+
+    def content_bbox(self) -> tuple[int, int, int, int]:
+        return self.alpha_bbox or (0, 0, self.width, self.height)
+
+
+def read_meta(path: Path, mtime: int, size: int, rel: str) -> tuple:
+    data = path.read_bytes()
+    with Image.open(io.BytesIO(data)) as img:
+        w, h = img.size
+        mode = img.mode
+        if "A" in img.getbands() or "transparency" in img.info:
+            bbox = img.convert("RGBA").getchannel("A").getbbox()
+        else:
+            bbox = (0, 0, w, h)
+    l, t, r, b = bbox or (None, None, None, None)
+    return rel, mtime, size, w, h, mode, l, t, r, b, hashlib.sha1(data).hexdigest()
+
+
+class SpriteMeta:
+    def __init__(self, root: Path, db_path: Path | None = None):
+        self.root = root
+        self.db_path = db_path or root / META_DB_NAME
+        self.conn: sqlite3.Connection | None = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.db_path)
+            self.conn.executescript(_SCHEMA)
+        return self.conn
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def exists(self) -> bool:
+        return self.db_path.is_file()
+
+    def _rel(self, path: Path) -> str:
+        return Path(os.path.relpath(path, self.root)).as_posix()
+
+    def refresh(self, max_workers: int | None = None) -> tuple[int, int]:
+        db = self._db()
+        found = scan_tree(self.root)
+        known = {rel: (mtime, size) for rel, mtime, size in db.execute("SELECT path, mtime, size FROM sprites")}
+
+        removed = [rel for rel in known if rel not in found]
+        # mtime/크기가 그대로인 파일은 다시 열지 않는다
+        todo = [(rel, meta) for rel, meta in found.items() if known.get(rel) != meta]
+
+        rows = []
+        if todo:
+            if max_workers is None:
+                max_workers = min(len(todo), os.cpu_count() or 1)
+            with process_pool(max_workers) as ex:
+                rows = list(ex.map(
+                    read_meta,
+                    [self.root / rel for rel, _ in todo],
+                    [m for _, (m, _) in todo],
+                    [s for _, (_, s) in todo],
+                    [rel for rel, _ in todo],
+                    chunksize=16,
+                ))
+
+        with db:
+            db.executemany("DELETE FROM sprites WHERE path = ?", [(rel,) for rel in removed])
+            db.executemany(f"INSERT OR REPLACE INTO sprites ({_COLUMNS}) VALUES (?,?,?,?,?,?,?,?,?,?,?)", rows)
+        return len(rows), len(removed)
+
+    def get(self, path: Path) -> SpriteInfo | None:
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        rel = self._rel(path)
+        db = self._db()
+        row = db.execute(f"SELECT {_COLUMNS} FROM sprites WHERE path = ?", (rel,)).fetchone()
+        if row is None or row[1] != st.st_mtime_ns or row[2] != st.st_size:
+            # 인덱스에 없거나 오래된 항목은 그 파일만 바로 다시 읽는다
+            row = read_meta(path, st.st_mtime_ns, st.st_size, rel)
+            with db:
+                db.execute(f"INSERT OR REPLACE INTO sprites ({_COLUMNS}) VALUES (?,?,?,?,?,?,?,?,?,?,?)", row)
+        return SpriteInfo(row)
+
+    def cached(self, path: Path) -> SpriteInfo | None:
+        # 인덱스에 있는 최신 행만 돌려준다 (디코딩/쓰기 없음, UI 스레드용)
+        if not self.exists():
+            return None
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        row = self._db().execute(f"SELECT {_COLUMNS} FROM sprites WHERE path = ?", (self._rel(path),)).fetchone()
+        if row is None or row[1] != st.st_mtime_ns or row[2] != st.st_size:
+            return None
+        return SpriteInfo(row)
+
+    def folder(self, folder: Path) -> list[SpriteInfo]:
+        prefix = self._rel(folder).rstrip("/") + "/"
+        rows = self._db().execute(
+            f"SELECT {_COLUMNS} FROM sprites WHERE path >= ? AND path < ? ORDER BY path",
+            (prefix, prefix[:-1] + "0"),
+        ).fetchall()
+        return [SpriteInfo(r) for r in rows if "/" not in r[0][len(prefix):]]
+
+    def count(self) -> int:
+        return self._db().execute("SELECT COUNT(*) FROM sprites").fetchone()[0]
+
+    def same_content(self, sha1: str) -> list[str]:
+        return [r[0] for r in self._db().execute("SELECT path FROM sprites WHERE sha1 = ? ORDER BY path", (sha1,))]
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="스프라이트 크기/모드/알파 bbox/해시 인덱스(SQLite) 만들기")
+    ap.add_argument("root", type=Path, nargs="?", default=Path("./images"))
+    ap.add_argument("--db", type=Path, default=None, help=f"인덱스 파일 (기본: <root>/{META_DB_NAME})")
+    ap.add_argument("--show", type=Path, nargs="*", default=[], help="이 파일들의 메타데이터 출력")
+    ap.add_argument("--workers", type=int, default=None, help="0이면 현재 프로세스에서 실행")
+    return ap
+
+
+def main(argv: list[str] | None = None):
+    args = build_arg_parser().parse_args(argv)
+    if not args.root.is_dir():
+        raise SystemExit(f"폴더를 찾지 못했습니다: {args.root.resolve()}")
+
+    meta = SpriteMeta(args.root, args.db)
+    updated, removed = meta.refresh(args.workers)
+    print(f"[META] {meta.count()} sprites (updated={updated}, removed={removed}) -> {meta.db_path}")
+    for path in args.show:
+        info = meta.get(path)
+        if info is None:
+            print(f"[META] {path}: not found")
+            continue
+        print(
+            f"[META] {info.path}: {info.width}x{info.height} {info.mode} "
+            f"bbox={info.alpha_bbox} bytes={info.file_size} sha1={info.sha1[:12]}"
+        )
+    meta.close()
+
+
+if __name__ == "__main__":
+    main()
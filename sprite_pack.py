@@ -0,0 +1,186 @@
+import argparse
+import io
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+
+from PIL import Image
+
+from output_store import OUTPUT_EXTS
+
+PACK_MAGIC = b"BAPK"
+PACK_VERSION = 1
+PACK_EXT = ".bapack"
+
+# 매직, 버전, 예약, 인덱스 위치, 인덱스 길이. 본문은 원본 PNG/WebP 바이트를 그대로 이어 붙인다
+_HEADER = struct.Struct("<4sHHQQ")
+
+_OPEN: dict[Path, "SpritePack"] = {}
+
+
+def collect_entries(root: Path, chars: list[str] | None = None) -> list[tuple[str, Path]]:
+    # root/<캐릭터>/<파일> -> ("캐릭터/파일", 경로)
+    entries = []
+    with os.scandir(root) as it:
+        char_dirs = sorted((e.name for e in it if e.is_dir() and not e.name.startswith(".")), key=str.lower)
+    for char in char_dirs:
+        if chars and char not in chars:
+            continue
+        with os.scandir(root / char) as it:
+            names = sorted(
+                (e.name for e in it if e.is_file() and os.path.splitext(e.name)[1].lower() in OUTPUT_EXTS),
+                key=str.lower,
+            )
+        entries.extend((f"{char}/{name}", root / char / name) for name in names)
+    return entries
+
+
+def write_pack(out_path: Path, entries: list[tuple[str, Path]]) -> int:
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    index = []
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, 0, 0))
+        for name, path in entries:
+            data = path.read_bytes()
+            try:
+                with Image.open(io.BytesIO(data)) as img:
+                    w, h = img.size
+            except Exception as e:
+                print(f"[PACK] {name} skipped: {e}")
+                continue
+            index.append([name, f.tell(), len(data), w, h])
+            f.write(data)
+
+        index_offset = f.tell()
+        raw = json.dumps({"entries": index}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        f.write(raw)
+        f.seek(0)
+        f.write(_HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, index_offset, len(raw)))
+    os.replace(tmp, out_path)
+    return len(index)
+
+
+class SpritePack:
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"empty pack file: {path}")
+        self.stat = os.fstat(self._file.fileno())
+
+        magic, version, _, offset, length = _HEADER.unpack_from(self._mm, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            self.close()
+            raise ValueError(f"not a sprite pack (v{PACK_VERSION}): {path}")
+        meta = json.loads(self._mm[offset:offset + length].decode("utf-8"))
+
+        self.entries: dict[str, tuple[int, int, int, int]] = {}
+        self.by_char: dict[str, list[str]] = {}
+        for name, off, size, w, h in meta["entries"]:
+            self.entries[name] = (off, size, w, h)
+            char, _, file_name = name.partition("/")
+            self.by_char.setdefault(char, []).append(file_name)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def chars(self) -> list[str]:
+        return sorted(self.by_char, key=str.lower)
+
+    def files(self, char: str) -> list[str]:
+        return self.by_char.get(char, [])
+
+    def image_size(self, name: str) -> tuple[int, int]:
+        _, _, w, h = self.entries[name]
+        return w, h
+
+    def read(self, name: str) -> bytes:
+        # 파일을 하나씩 열지 않고 매핑된 영역에서 바로 잘라 온다
+        off, size, _, _ = self.entries[name]
+        return self._mm[off:off + size]
+
+    def open_image(self, name: str) -> Image.Image:
+        return Image.open(io.BytesIO(self.read(name)))
+
+    def close(self):
+        _OPEN.pop(self.path, None)
+        self._mm.close()
+        self._file.close()
+
+
+def open_pack(path: Path) -> SpritePack:
+    pack = _OPEN.get(path)
+    if pack is None:
+        pack = _OPEN[path] = SpritePack(path)
+    return pack
+
+
+def pack_entry(path: Path) -> tuple[SpritePack, str] | None:
+    # 뷰어는 팩 안의 항목을 <팩 파일>/<캐릭터>/<파일> 경로로 다룬다
+    pack = _OPEN.get(path.parent.parent)
+    if pack is None:
+        return None
+    name = f"{path.parent.name}/{path.name}"
+    return (pack, name) if name in pack.entries else None
+
+
+def extract_pack(pack: SpritePack, out_root: Path) -> int:
+    for name in pack.entries:
+        out_path = out_root / name
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        out_path.write_bytes(pack.read(name))
+    return len(pack)
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="emotion/ 같은 출력 폴더를 팩 파일 하나로 묶기 / 풀기")
+    ap.add_argument("src", type=Path, help="묶을 폴더(<캐릭터>/<파일>) 또는 --list/--extract할 팩 파일")
+    ap.add_argument("--out", type=Path, default=None, help=f"팩 파일 (기본: <폴더>{PACK_EXT})")
+    ap.add_argument("--chars", nargs="*", default=None, help="이 캐릭터만 묶기")
+    ap.add_argument("--per-char", type=Path, default=None, help="캐릭터마다 <폴더>/<캐릭터>.bapack으로 따로 묶기")
+    ap.add_argument("--list", action="store_true", help="팩 내용 출력")
+    ap.add_argument("--extract", type=Path, default=None, help="팩을 이 폴더에 풀기")
+    return ap
+
+
+def main(argv: list[str] | None = None):
+    args = build_arg_parser().parse_args(argv)
+
+    if args.list or args.extract:
+        pack = open_pack(args.src)
+        if args.list:
+            for char in pack.chars():
+                print(f"[PACK] {char}: {len(pack.files(char))} images")
+            print(f"[PACK] {len(pack)} images, {pack.stat.st_size / 1024 / 1024:.1f}MB")
+        if args.extract:
+            count = extract_pack(pack, args.extract)
+            print(f"[PACK] extracted {count} images -> {args.extract}")
+        pack.close()
+        return
+
+    if not args.src.is_dir():
+        raise SystemExit(f"폴더를 찾지 못했습니다: {args.src.resolve()}")
+    entries = collect_entries(args.src, args.chars)
+    src_bytes = sum(p.stat().st_size for _, p in entries)
+    if args.per_char:
+        by_char: dict[str, list[tuple[str, Path]]] = {}
+        for name, path in entries:
+            by_char.setdefault(name.partition("/")[0], []).append((name, path))
+        targets = [(args.per_char / f"{char}{PACK_EXT}", items) for char, items in by_char.items()]
+    else:
+        targets = [(args.out or args.src.with_name(args.src.name + PACK_EXT), entries)]
+
+    for out_path, items in targets:
+        count = write_pack(out_path, items)
+        print(f"[PACK] {out_path}: {count} images, {out_path.stat().st_size / 1024 / 1024:.1f}MB")
+    print(f"[PACK] {len(entries)} files ({src_bytes / 1024 / 1024:.1f}MB) -> {len(targets)} pack(s)")
+
+
+if __name__ == "__main__":
+    main()
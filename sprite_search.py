@@ -0,0 +1,136 @@
+import bisect
+import difflib
+import os
+import re
+from pathlib import Path
+
+from output_store import OUTPUT_EXTS
+
+# crop/채팅 출력 형식 + 직접 넣어 둔 JPEG
+IMAGE_EXTS = OUTPUT_EXTS + (".jpg", ".jpeg")
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class SearchIndex:
+    def __init__(self):
+        self.entries: list[tuple[Path, str] | None] = []
+        self.sort_keys: list[tuple[str, str]] = []
+        self._rank: list[int] | None = None
+        self.ids: dict[Path, int] = {}
+        self.postings: dict[str, set[int]] = {}
+        self.vocab: list[str] = []
+        self._last_terms: list[str] = []
+        self._last_ids: set[int] | None = None
+
+    @classmethod
+    def build(cls, root: Path, suffixes: tuple[str, ...] = IMAGE_EXTS) -> "SearchIndex":
+        index = cls()
+        if not root.is_dir():
+            return index
+        with os.scandir(root) as chars:
+            for c in chars:
+                if not c.is_dir():
+                    continue
+                with os.scandir(c.path) as files:
+                    for f in files:
+                        if f.is_file() and os.path.splitext(f.name)[1].lower() in suffixes:
+                            index._add(root / c.name / f.name, c.name, keep_sorted=False)
+        index.vocab.sort()
+        return index
+
+    @classmethod
+    def from_items(cls, items: list[tuple[Path, str]]) -> "SearchIndex":
+        index = cls()
+        for path, char in items:
+            index._add(path, char, keep_sorted=False)
+        index.vocab.sort()
+        return index
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, path: Path, char: str):
+        self._add(path, char, keep_sorted=True)
+
+    def _add(self, path: Path, char: str, keep_sorted: bool):
+        if path in self.ids:
+            return
+        i = len(self.entries)
+        self.entries.append((path, char))
+        self.sort_keys.append((char.lower(), path.name.lower()))
+        self._rank = None
+        self.ids[path] = i
+        for tok in set(tokenize(char) + tokenize(path.stem)):
+            posting = self.postings.get(tok)
+            if posting is None:
+                posting = self.postings[tok] = set()
+                if keep_sorted:
+                    bisect.insort(self.vocab, tok)
+                else:
+                    self.vocab.append(tok)
+            posting.add(i)
+        self._last_ids = None
+
+    def remove(self, path: Path):
+        i = self.ids.pop(path, None)
+        if i is None:
+            return
+        self.entries[i] = None
+        for posting in self.postings.values():
+            posting.discard(i)
+        self._last_ids = None
+
+    def _prefix_ids(self, term: str) -> set[int]:
+        out: set[int] = set()
+        lo = bisect.bisect_left(self.vocab, term)
+        for tok in self.vocab[lo:]:
+            if not tok.startswith(term):
+                break
+            out |= self.postings[tok]
+        return out
+
+    def _fuzzy_ids(self, term: str) -> set[int]:
+        out: set[int] = set()
+        for tok in difflib.get_close_matches(term, self.vocab, n=8, cutoff=0.75):
+            out |= self.postings[tok]
+        return out
+
+    def search(self, query: str) -> list[tuple[Path, str]]:
+        terms = tokenize(query)
+        if not terms:
+            self._last_terms, self._last_ids = [], None
+            return []
+
+        # 앞 검색어를 이어서 입력한 경우에는 직전 결과 안에서만 다시 거른다
+        ids = None
+        last = self._last_terms
+        if (
+            self._last_ids is not None
+            and len(terms) >= len(last)
+            and terms[:len(last) - 1] == last[:-1]
+            and terms[len(last) - 1].startswith(last[-1])
+        ):
+            ids = set(self._last_ids)
+
+        exact = True
+        for term in terms:
+            hit = self._prefix_ids(term)
+            if not hit:
+                hit = self._fuzzy_ids(term)
+                exact = False
+            ids = hit if ids is None else ids & hit
+            if not ids:
+                break
+
+        self._last_terms = terms
+        self._last_ids = ids if exact else None
+        if self._rank is None:
+            self._rank = [0] * len(self.sort_keys)
+            for r, i in enumerate(sorted(range(len(self.sort_keys)), key=self.sort_keys.__getitem__)):
+                self._rank[i] = r
+        return [self.entries[i] for i in sorted(ids or (), key=self._rank.__getitem__)]